@@ -1,4 +1,6 @@
 import numpy as np
+import zlib
+from itertools import chain, repeat
 
 def bag_of_words_vector(tokens, vocab):
     """
@@ -12,4 +14,52 @@ def bag_of_words_vector(tokens, vocab):
             vector[vocab_to_idx[token]] += 1
 
     return vector
-    
\ No newline at end of file
+
+
+class BagOfWordsVectorizer:
+    """
+    Batched bag-of-words counts as a sparse CSR matrix.
+
+    With a vocab, the term -> column index is built once and reused for
+    every batch. Without one, n_features columns are addressed with the
+    hashing trick (crc32 of the UTF-8 token), which needs no vocabulary.
+    """
+
+    def __init__(self, vocab=None, n_features=2 ** 20):
+        if vocab is not None:
+            # duplicate terms map to their last position, as in bag_of_words_vector
+            self.vocab_to_idx = {term: i for i, term in enumerate(vocab)}
+            self.n_features = len(vocab)
+        else:
+            self.vocab_to_idx = None
+            self.n_features = n_features
+
+    def _columns(self, flat_tokens):
+        if self.vocab_to_idx is not None:
+            cols = map(self.vocab_to_idx.get, flat_tokens, repeat(-1))
+            return np.fromiter(cols, dtype=np.int64, count=len(flat_tokens))
+        # hash each distinct token of the batch once
+        hashed = {tok: zlib.crc32(tok.encode("utf-8")) % self.n_features for tok in set(flat_tokens)}
+        return np.fromiter(map(hashed.__getitem__, flat_tokens), dtype=np.int64, count=len(flat_tokens))
+
+    def transform(self, docs):
+        """
+        Returns scipy.sparse.csr_matrix of shape (len(docs), n_features), dtype=int64,
+        where row i holds the token counts of docs[i]. Out-of-vocabulary tokens are ignored.
+        """
+        from scipy import sparse
+
+        lengths = np.fromiter(map(len, docs), dtype=np.int64, count=len(docs))
+        flat = list(chain.from_iterable(docs))
+        cols = self._columns(flat)
+        rows = np.repeat(np.arange(len(docs), dtype=np.int64), lengths)
+
+        keep = cols >= 0
+        # one key per (row, column) cell, counted in a single pass
+        keys, counts = np.unique(rows[keep] * self.n_features + cols[keep], return_counts=True)
+        indices = keys % self.n_features
+        indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // self.n_features, minlength=len(docs)), out=indptr[1:])
+
+        return sparse.csr_matrix((counts.astype(np.int64), indices, indptr),
+                                 shape=(len(docs), self.n_features))
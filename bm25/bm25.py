@@ -1,6 +1,15 @@
 import numpy as np
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import itertools
 import math
+import os
+import struct
+import threading
+
+# relative slack on MaxScore upper bounds, covers summation-order rounding
+_MAXSCORE_EPS = 1e-9
 
 def bm25_score(query_tokens, docs, k1=1.2, b=0.75):
     """
@@ -56,3 +65,1055 @@ def bm25_score(query_tokens, docs, k1=1.2, b=0.75):
         scores[i] = doc_score
 
     return scores
+
+
+def _distinct(ids, n):
+    """
+    Returns the sorted distinct values of ids, all in range(n).
+    """
+    if 64 * len(ids) > n:
+        # a dense mask dedups long id lists far faster than sorting or hashing
+        mask = np.zeros(n, dtype=bool)
+        mask[ids] = True
+        return np.flatnonzero(mask)
+    return np.unique(ids)
+
+
+def _exhaustive_top_k(scores, k):
+    """
+    Returns list of (doc_id, score) for the k best positive entries of a
+    dense score array, ranked by (score desc, doc_id asc). Selects the k-th
+    score with a linear-time partition and only sorts documents at or above it.
+    """
+    if k <= 0:
+        return []
+    if k < len(scores):
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        ids = np.flatnonzero((scores >= kth) & (scores > 0))
+    else:
+        ids = np.flatnonzero(scores > 0)
+    best = ids[np.lexsort((ids, -scores[ids]))[:k]]
+    return [(int(d), float(scores[d])) for d in best]
+
+
+class BM25Index:
+    """
+    Inverted index over a fixed corpus for repeated BM25 queries.
+
+    Postings, document frequencies, document lengths and avgdl are computed
+    once at build time; a query only touches the postings of its own terms.
+    Scores are identical to bm25_score(query_tokens, docs, k1, b).
+    """
+
+    def __init__(self, docs, k1=1.2, b=0.75, corpus_stats=None):
+        """
+        corpus_stats: optional (num_docs, avgdl, df) of the full corpus when
+        docs is one shard of it, so idf and length normalisation match the
+        unsharded index. df must cover every term in docs.
+        """
+        doc_lens = np.array([len(doc) for doc in docs], dtype=float)
+        if corpus_stats is None:
+            self._init_lengths(doc_lens, k1, b)
+            self._corpus_df = None
+        else:
+            corpus_N, avgdl, self._corpus_df = corpus_stats
+            self._init_lengths(doc_lens, k1, b, corpus_N=corpus_N, avgdl=avgdl)
+
+        # term -> (doc ids, term frequencies), doc ids ascending
+        postings_ids = {}
+        postings_tfs = {}
+        for i, doc in enumerate(docs):
+            for term, tf in Counter(doc).items():
+                if term not in postings_ids:
+                    postings_ids[term] = []
+                    postings_tfs[term] = []
+                postings_ids[term].append(i)
+                postings_tfs[term].append(tf)
+
+        self.postings = {
+            term: (np.array(ids, dtype=np.int64), np.array(postings_tfs[term], dtype=float))
+            for term, ids in postings_ids.items()
+        }
+
+        # per-posting BM25 contribution and per-term upper bound for top_k pruning
+        self.impacts = {}
+        self.max_impact = {}
+        for term, (ids, tfs) in self.postings.items():
+            term_idf = self.idf(term)
+            contrib = term_idf * tfs * (k1 + 1) / (tfs + self.denom_base[ids])
+            self.impacts[term] = contrib
+            self.max_impact[term] = float(contrib.max())
+
+    def _init_lengths(self, doc_lens, k1, b, corpus_N=None, avgdl=None):
+        self.k1 = k1
+        self.b = b
+        self.N = len(doc_lens)
+        # documents counted by idf, differs from N for a shard
+        self.corpus_N = self.N if corpus_N is None else corpus_N
+
+        self.doc_lens = doc_lens
+        if avgdl is None:
+            avgdl = self.doc_lens.mean() if self.N > 0 else 0.0
+        self.avgdl = avgdl
+
+        if self.avgdl > 0:
+            len_norm = (1 - b + b * (self.doc_lens / self.avgdl))
+        else:
+            len_norm = np.ones(self.N, dtype=float)
+        # k1 * (1 - b + b * |D| / avgdl), the per-document part of the denominator
+        self.denom_base = k1 * len_norm
+
+    def _idf_from_df(self, d):
+        return math.log((self.corpus_N - d + 0.5) / (d + 0.5) + 1)
+
+    def idf(self, term):
+        """
+        Returns the BM25 idf of term, 0.0 if it does not occur in the corpus.
+        """
+        entry = self.postings.get(term)
+        if entry is None:
+            return 0.0
+        if self._corpus_df is not None:
+            return self._idf_from_df(self._corpus_df[term])
+        return self._idf_from_df(len(entry[0]))
+
+    def term_scores(self, term):
+        """
+        Returns (doc ids, BM25 contributions) of a single term, or None if absent.
+        """
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        return entry[0], self.impacts[term]
+
+    def upper_bound(self, term):
+        """
+        Returns the largest BM25 contribution of term to any document.
+        """
+        return self.max_impact.get(term, 0.0)
+
+    def score(self, query_tokens):
+        """
+        Returns numpy array of BM25 scores for each document.
+        """
+        scores = np.zeros(self.N, dtype=float)
+
+        for term in dict.fromkeys(query_tokens):
+            entry = self.term_scores(term)
+            if entry is None:
+                continue
+            ids, contrib = entry
+            scores[ids] += contrib
+
+        return scores
+
+    def top_k(self, query_tokens, k=10):
+        """
+        Returns list of (doc_id, score) for the k best documents, best first.
+
+        Uses term-at-a-time MaxScore pruning: query terms are scanned in
+        decreasing order of their upper-bound contribution. Once the bounds
+        of the remaining terms together cannot beat the current k-th partial
+        score, unseen documents cannot enter the top k, and the remaining
+        terms, usually frequent ones with long postings, are only probed for
+        the surviving candidates. Terms keep being scanned while candidates
+        are too many for probing to pay off, and queries whose skippable
+        postings are short next to the ones that must be scanned are scored
+        exhaustively.
+
+        The result equals the first k entries of the exhaustive ranking of
+        score(query_tokens) by (score desc, doc_id asc), restricted to
+        documents with a positive score.
+        """
+        if k <= 0:
+            return []
+        entries = []
+        bounds = []
+        for term in dict.fromkeys(query_tokens):
+            entry = self.term_scores(term)
+            if entry is not None:
+                entries.append(entry)
+                bounds.append(self.upper_bound(term))
+        if not entries:
+            return []
+
+        T = len(entries)
+        order = sorted(range(T), key=lambda t: -bounds[t])
+        sorted_bounds = [bounds[t] for t in order]
+        # suffix[j]: bound on what the terms after order[j] can still add
+        suffix = np.cumsum(sorted_bounds[::-1])[::-1].tolist()[1:] + [0.0]
+        # the k-th partial after j + 1 terms is at most prefix[j], so pruning
+        # can only start where the remaining bounds fall below it, and only
+        # pays off when the postings it could skip outweigh those it must scan
+        prefix = np.cumsum(sorted_bounds).tolist()
+        lengths = np.cumsum([len(entries[t][0]) for t in order]).tolist()
+        first = next((j for j in range(T - 1) if suffix[j] < prefix[j]), None)
+        prune = first is not None and lengths[-1] - lengths[first] >= 2 * lengths[first]
+        if not prune and 8 * lengths[-1] > self.N:
+            return _exhaustive_top_k(self.score(query_tokens), k)
+
+        acc = np.zeros(self.N, dtype=float)
+        theta = -np.inf
+        cand = None
+        for j, t in enumerate(order):
+            ids, contrib = entries[t]
+            acc[ids] += contrib
+            if j == T - 1:
+                break
+            if not prune or suffix[j] >= prefix[j]:
+                continue
+            # the k-th partial of a scanned list is a lower bound on the k-th final score
+            if len(ids) >= k:
+                part = acc[ids]
+                theta = max(theta, float(np.partition(part, len(part) - k)[len(part) - k]))
+            rest = suffix[j] * (1 + _MAXSCORE_EPS)
+            floor = theta - _MAXSCORE_EPS * abs(theta)
+            if rest >= floor:
+                continue
+            if 64 * lengths[j] > self.N:
+                # unscanned documents have acc == 0 < floor - rest
+                seen = np.flatnonzero(acc >= floor - rest)
+            else:
+                seen = np.concatenate([entries[u][0] for u in order[:j + 1]]) if j else ids
+                seen = seen[acc[seen] >= floor - rest]
+                seen = _distinct(seen, self.N) if j else seen
+            # a binary-search probe costs about as much as scanning 16 postings
+            if 16 * len(seen) * (T - j - 1) < lengths[-1] - lengths[j]:
+                cand = seen
+                break
+
+        if cand is None:
+            # every term was scanned, so partials are full scores up to summation order
+            if 8 * lengths[-1] > self.N:
+                seen = None
+                part = acc
+            elif T > 1:
+                seen = _distinct(np.concatenate([ids for ids, _ in entries]), self.N)
+                part = acc[seen]
+            else:
+                seen = entries[0][0]
+                part = acc[seen]
+            if len(part) >= k:
+                theta = max(theta, float(np.partition(part, len(part) - k)[len(part) - k]))
+            hit = np.flatnonzero((part >= theta - _MAXSCORE_EPS * abs(theta)) & (part > 0))
+            cand = hit if seen is None else seen[hit]
+            j = T - 1
+
+        # non-essential terms: probe their postings for the candidates only
+        for j in range(j + 1, T):
+            ids, contrib = entries[order[j]]
+            pos = np.minimum(np.searchsorted(ids, cand), len(ids) - 1)
+            found = ids[pos] == cand
+            acc[cand[found]] += contrib[pos[found]]
+            part = acc[cand]
+            if len(part) >= k:
+                theta = max(theta, float(np.partition(part, len(part) - k)[len(part) - k]))
+            floor = theta - _MAXSCORE_EPS * abs(theta)
+            cand = cand[part + suffix[j] * (1 + _MAXSCORE_EPS) >= floor]
+
+        # exact score, summed in query-term order as in score()
+        exact = np.zeros(len(cand), dtype=float)
+        for ids, contrib in entries:
+            pos = np.minimum(np.searchsorted(ids, cand), len(ids) - 1)
+            exact += np.where(ids[pos] == cand, contrib[pos], 0.0)
+
+        best = np.lexsort((cand, -exact))[:k]
+        return [(int(cand[i]), float(exact[i])) for i in best]
+
+    def _terms(self):
+        return self.postings.keys()
+
+    def _weight_matrix(self):
+        """
+        Returns (term -> row, CSR matrix of shape (V, N)) holding every
+        per-posting BM25 contribution, k1/b length normalisation included.
+        Built on first use and cached.
+        """
+        if getattr(self, "_weights", None) is None:
+            from scipy import sparse
+
+            term_rows = {}
+            ids_parts = []
+            data_parts = []
+            for term in self._terms():
+                ids, contrib = self.term_scores(term)
+                term_rows[term] = len(term_rows)
+                ids_parts.append(ids)
+                data_parts.append(contrib)
+
+            indptr = np.zeros(len(term_rows) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(ids) for ids in ids_parts])
+            indices = np.concatenate(ids_parts) if ids_parts else np.empty(0, dtype=np.int64)
+            data = np.concatenate(data_parts) if data_parts else np.empty(0, dtype=float)
+            W = sparse.csr_matrix((data, indices, indptr), shape=(len(term_rows), self.N))
+            self._weights = (term_rows, W)
+        return self._weights
+
+    def score_batch(self, queries, k=None):
+        """
+        Scores a batch of token lists as one sparse product Q @ W, where Q is
+        the (num_queries, V) indicator matrix of unique query terms and W the
+        cached (V, N) BM25 weight matrix.
+
+        Returns a (num_queries, N) numpy array, or with k given, one list of
+        (doc_id, score) per query ranked like top_k. Scores agree with score()
+        up to floating-point summation order.
+        """
+        from scipy import sparse
+
+        term_rows, W = self._weight_matrix()
+        rows = []
+        cols = []
+        for qi, query in enumerate(queries):
+            for term in dict.fromkeys(query):
+                row = term_rows.get(term)
+                if row is not None:
+                    rows.append(qi)
+                    cols.append(row)
+        Q = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=float), (rows, cols)),
+            shape=(len(queries), len(term_rows)),
+        )
+        R = (Q @ W).tocsr()
+
+        if k is None:
+            return R.toarray()
+
+        results = []
+        for qi in range(len(queries)):
+            a, e = R.indptr[qi], R.indptr[qi + 1]
+            doc_ids = R.indices[a:e]
+            scores = R.data[a:e]
+            hit = scores > 0
+            doc_ids, scores = doc_ids[hit], scores[hit]
+            best = np.lexsort((doc_ids, -scores))[:max(k, 0)]
+            results.append([(int(doc_ids[i]), float(scores[i])) for i in best])
+        return results
+
+    def save(self, path):
+        """
+        Writes the index in the binary format read by MappedBM25Index.
+
+        Layout (little-endian, every section 8-byte aligned):
+          header      magic, N, V, k1, b, then (offset, nbytes) of each section
+          doc_lens    float32[N]
+          term_offs   uint64[V + 1] into term_blob, terms sorted by UTF-8 bytes
+          term_blob   concatenated UTF-8 terms
+          df          uint64[V]
+          post_offs   uint64[V + 1] into post_blob
+          post_blob   per term: varint doc-id deltas, then varint tfs
+          max_impact  float64[V]
+        Document lengths must be below 2**24 to be exact in float32.
+        """
+        if self._corpus_df is not None:
+            raise ValueError("cannot save a shard index built with corpus_stats")
+        terms = sorted(self.postings, key=lambda t: t.encode("utf-8"))
+        encoded = [t.encode("utf-8") for t in terms]
+
+        term_offs = np.zeros(len(terms) + 1, dtype=np.uint64)
+        term_offs[1:] = np.cumsum([len(t) for t in encoded])
+
+        df = np.array([len(self.postings[t][0]) for t in terms], dtype=np.uint64)
+        max_impact = np.array([self.max_impact[t] for t in terms], dtype=np.float64)
+
+        chunks = []
+        for t in terms:
+            ids, tfs = self.postings[t]
+            deltas = np.diff(ids, prepend=0).astype(np.uint64)
+            chunks.append(_varint_encode(np.concatenate((deltas, tfs.astype(np.uint64)))))
+        post_offs = np.zeros(len(terms) + 1, dtype=np.uint64)
+        post_offs[1:] = np.cumsum([len(c) for c in chunks])
+
+        sections = [
+            self.doc_lens.astype(np.float32).tobytes(),
+            term_offs.tobytes(),
+            b"".join(encoded),
+            df.tobytes(),
+            post_offs.tobytes(),
+            b"".join(chunks),
+            max_impact.tobytes(),
+        ]
+
+        header_size = _align8(struct.calcsize(_HEADER_FMT))
+        offset = header_size
+        layout = []
+        for sec in sections:
+            layout.extend((offset, len(sec)))
+            offset = _align8(offset + len(sec))
+
+        with open(path, "wb") as f:
+            header = struct.pack(_HEADER_FMT, _MAGIC, self.N, len(terms), self.k1, self.b, *layout)
+            f.write(header.ljust(header_size, b"\0"))
+            for sec in sections:
+                f.write(sec)
+                f.write(b"\0" * (_align8(len(sec)) - len(sec)))
+
+    @staticmethod
+    def load(path):
+        """
+        Returns a MappedBM25Index over a file written by save().
+        """
+        return MappedBM25Index(path)
+
+
+_MAGIC = b"BM25IDX1"
+# magic, N, V, k1, b, (offset, nbytes) for each of the 7 sections
+_HEADER_FMT = "<8sQQdd" + "QQ" * 7
+
+
+def _align8(n):
+    return (n + 7) // 8 * 8
+
+
+def _varint_encode(values):
+    """
+    LEB128-encodes a uint64 array, returns bytes.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for j in range(1, 10):
+        nbytes += values >= np.uint64(1 << (7 * j))
+
+    width = int(nbytes.max())
+    shifts = (7 * np.arange(width)).astype(np.uint64)
+    groups = ((values[:, None] >> shifts[None, :]) & np.uint64(0x7F)).astype(np.uint8)
+    cont = np.arange(width)[None, :] < (nbytes[:, None] - 1)
+    groups[cont] |= 0x80
+    return groups[np.arange(width)[None, :] < nbytes[:, None]].tobytes()
+
+
+def _varint_decode(buf):
+    """
+    Decodes a LEB128 byte array (np.uint8), returns uint64 array.
+    """
+    buf = np.asarray(buf, dtype=np.uint8)
+    if len(buf) == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = (buf & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    group = np.cumsum(np.concatenate(([0], ends[:-1])))
+    shift = (7 * (np.arange(len(buf)) - starts[group])).astype(np.uint64)
+    parts = (buf & 0x7F).astype(np.uint64) << shift
+    return np.add.reduceat(parts, starts)
+
+
+class MappedBM25Index(BM25Index):
+    """
+    Read-only BM25Index backed by a file written with BM25Index.save().
+
+    The file is opened with np.memmap and all arrays are views into it, so
+    loading does no parsing and worker processes share pages through the OS
+    page cache. Postings are decoded on demand for the query terms only.
+    """
+
+    def __init__(self, path):
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        fields = struct.unpack_from(_HEADER_FMT, self._mm, 0)
+        magic, N, V, k1, b = fields[:5]
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a BM25 index file")
+        layout = fields[5:]
+
+        def section(i, dtype):
+            offset, nbytes = layout[2 * i], layout[2 * i + 1]
+            return self._mm[offset:offset + nbytes].view(dtype)
+
+        self._init_lengths(section(0, np.float32).astype(float), k1, b)
+        self._term_offs = section(1, np.uint64)
+        self._term_blob = section(2, np.uint8)
+        self._df = section(3, np.uint64)
+        self._post_offs = section(4, np.uint64)
+        self._post_blob = section(5, np.uint8)
+        self._max_impact = section(6, np.float64)
+        self.V = V
+
+    def _term_id(self, term):
+        key = term.encode("utf-8")
+        lo, hi = 0, self.V
+        while lo < hi:
+            mid = (lo + hi) // 2
+            a, e = int(self._term_offs[mid]), int(self._term_offs[mid + 1])
+            if self._term_blob[a:e].tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.V:
+            a, e = int(self._term_offs[lo]), int(self._term_offs[lo + 1])
+            if self._term_blob[a:e].tobytes() == key:
+                return lo
+        return None
+
+    def _terms(self):
+        for tid in range(self.V):
+            a, e = int(self._term_offs[tid]), int(self._term_offs[tid + 1])
+            yield self._term_blob[a:e].tobytes().decode("utf-8")
+
+    def _postings(self, tid):
+        a, e = int(self._post_offs[tid]), int(self._post_offs[tid + 1])
+        d = int(self._df[tid])
+        values = _varint_decode(self._post_blob[a:e])
+        ids = np.cumsum(values[:d]).astype(np.int64)
+        return ids, values[d:].astype(float)
+
+    def idf(self, term):
+        tid = self._term_id(term)
+        if tid is None:
+            return 0.0
+        return self._idf_from_df(int(self._df[tid]))
+
+    def term_scores(self, term):
+        tid = self._term_id(term)
+        if tid is None:
+            return None
+        ids, tfs = self._postings(tid)
+        term_idf = self._idf_from_df(int(self._df[tid]))
+        return ids, term_idf * tfs * (self.k1 + 1) / (tfs + self.denom_base[ids])
+
+    def upper_bound(self, term):
+        tid = self._term_id(term)
+        if tid is None:
+            return 0.0
+        return float(self._max_impact[tid])
+
+    def save(self, path):
+        """
+        Writes the mapped file back out; its bytes already are the format of
+        BM25Index.save(). The copy goes through a temporary file replaced
+        atomically, so saving over the source file leaves the mapping valid.
+        """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(memoryview(self._mm))
+        os.replace(tmp, path)
+
+
+_NOT_DELETED = np.iinfo(np.int64).max
+
+
+class _Segment:
+    """
+    Immutable postings for a run of documents. Only deleted_gen is written
+    after construction, and only for generations newer than any snapshot
+    that can already see the segment.
+    """
+
+    def __init__(self, doc_ids, doc_lens, postings):
+        self.doc_ids = doc_ids
+        self.doc_lens = doc_lens
+        # term -> (local doc indices, term frequencies)
+        self.postings = postings
+        # generation at which each document was deleted
+        self.deleted_gen = np.full(len(doc_ids), _NOT_DELETED, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_docs(cls, doc_ids, counters, lens):
+        postings_ids = {}
+        postings_tfs = {}
+        for i, tc in enumerate(counters):
+            for term, tf in tc.items():
+                if term not in postings_ids:
+                    postings_ids[term] = []
+                    postings_tfs[term] = []
+                postings_ids[term].append(i)
+                postings_tfs[term].append(tf)
+        postings = {
+            term: (np.array(ids, dtype=np.int64), np.array(postings_tfs[term], dtype=float))
+            for term, ids in postings_ids.items()
+        }
+        return cls(np.array(doc_ids, dtype=np.int64), np.array(lens, dtype=float), postings)
+
+    @classmethod
+    def merge(cls, segments):
+        """
+        Merges adjacent segments, dropping documents that are already deleted.
+        """
+        lives = [seg.deleted_gen == _NOT_DELETED for seg in segments]
+        doc_ids = np.concatenate([seg.doc_ids[live] for seg, live in zip(segments, lives)])
+        doc_lens = np.concatenate([seg.doc_lens[live] for seg, live in zip(segments, lives)])
+
+        remaps = []
+        base = 0
+        for live in lives:
+            remaps.append(np.cumsum(live) - 1 + base)
+            base += int(live.sum())
+
+        parts = {}
+        for seg, live, remap in zip(segments, lives, remaps):
+            for term, (local, tfs) in seg.postings.items():
+                keep = live[local]
+                if keep.any():
+                    parts.setdefault(term, []).append((remap[local[keep]], tfs[keep]))
+        postings = {
+            term: (np.concatenate([p[0] for p in ps]), np.concatenate([p[1] for p in ps]))
+            for term, ps in parts.items()
+        }
+        return cls(doc_ids, doc_lens, postings)
+
+
+class BM25Corpus:
+    """
+    Mutable BM25 corpus with incrementally maintained statistics.
+
+    add() and delete() update df, document lengths and avgdl in O(|doc|).
+    New documents are buffered and flushed into immutable segments; deletes
+    are tombstones stamped with a write generation. Segments are merged in
+    the style of Lucene's log merge policy: once merge_factor adjacent
+    segments share a size level they are rewritten as one, purging deleted
+    documents.
+
+    snapshot() returns a BM25Snapshot that keeps scoring the corpus exactly
+    as it was when taken, regardless of later writes and merges.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, max_buffer_docs=1000, merge_factor=10):
+        self.k1 = k1
+        self.b = b
+        self.max_buffer_docs = max_buffer_docs
+        self.merge_factor = merge_factor
+
+        self.df = {}
+        self.num_docs = 0
+        self.total_len = 0
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._next_doc_id = 0
+        self._segments = ()
+        # doc id -> (Counter, length), not yet flushed
+        self._buffer = {}
+        # doc id -> unique terms, to undo df on delete
+        self._doc_terms = {}
+        # doc id -> segment holding it
+        self._doc_segment = {}
+
+    @property
+    def avgdl(self):
+        return self.total_len / self.num_docs if self.num_docs > 0 else 0.0
+
+    def add(self, doc):
+        """
+        Adds a token list, returns its doc id.
+        """
+        tc = Counter(doc)
+        with self._lock:
+            doc_id = self._next_doc_id
+            self._next_doc_id += 1
+            self._generation += 1
+
+            self._buffer[doc_id] = (tc, len(doc))
+            self._doc_terms[doc_id] = tuple(tc)
+            for term in tc:
+                self.df[term] = self.df.get(term, 0) + 1
+            self.num_docs += 1
+            self.total_len += len(doc)
+
+            if len(self._buffer) >= self.max_buffer_docs:
+                self._flush()
+        return doc_id
+
+    def delete(self, doc_id):
+        """
+        Deletes a document by id. Raises KeyError if it is not live.
+        """
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id)
+            self._generation += 1
+
+            if doc_id in self._buffer:
+                _, length = self._buffer.pop(doc_id)
+            else:
+                seg = self._doc_segment.pop(doc_id)
+                local = int(np.searchsorted(seg.doc_ids, doc_id))
+                seg.deleted_gen[local] = self._generation
+                length = int(seg.doc_lens[local])
+
+            for term in terms:
+                d = self.df[term] - 1
+                if d:
+                    self.df[term] = d
+                else:
+                    del self.df[term]
+            self.num_docs -= 1
+            self.total_len -= length
+
+    def flush(self):
+        """
+        Moves buffered documents into a new segment.
+        """
+        with self._lock:
+            self._flush()
+
+    def force_merge(self, max_segments=1):
+        """
+        Merges segments until at most max_segments remain.
+        """
+        with self._lock:
+            self._flush()
+            while len(self._segments) > max_segments:
+                n = min(self.merge_factor, len(self._segments) - max_segments + 1)
+                sizes = [len(seg) for seg in self._segments]
+                # merge the run of n adjacent segments with the fewest documents
+                start = min(range(len(sizes) - n + 1), key=lambda i: sum(sizes[i:i + n]))
+                self._merge_range(start, start + n)
+
+    def snapshot(self):
+        """
+        Returns a BM25Snapshot of the current corpus.
+        """
+        with self._lock:
+            self._flush()
+            return BM25Snapshot(self._segments, self._generation, self.num_docs,
+                                self.total_len, self.k1, self.b)
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        doc_ids = list(self._buffer)
+        counters = [self._buffer[i][0] for i in doc_ids]
+        lens = [self._buffer[i][1] for i in doc_ids]
+        seg = _Segment.from_docs(doc_ids, counters, lens)
+        self._buffer = {}
+        for doc_id in doc_ids:
+            self._doc_segment[doc_id] = seg
+        self._segments = self._segments + (seg,)
+        self._maybe_merge()
+
+    def _level(self, seg):
+        live = max(1, int((seg.deleted_gen == _NOT_DELETED).sum()))
+        return int(math.log(max(1.0, live / self.max_buffer_docs), self.merge_factor))
+
+    def _maybe_merge(self):
+        merged = True
+        while merged:
+            merged = False
+            levels = [self._level(seg) for seg in self._segments]
+            for start in range(len(levels) - self.merge_factor + 1):
+                run = levels[start:start + self.merge_factor]
+                if min(run) == max(run):
+                    self._merge_range(start, start + self.merge_factor)
+                    merged = True
+                    break
+
+    def _merge_range(self, start, end):
+        seg = _Segment.merge(self._segments[start:end])
+        for doc_id in seg.doc_ids.tolist():
+            self._doc_segment[doc_id] = seg
+        # a new tuple, so existing snapshots keep the old segments
+        self._segments = self._segments[:start] + (seg,) + self._segments[end:]
+
+
+class BM25Snapshot:
+    """
+    Point-in-time view of a BM25Corpus.
+
+    A document is visible if it was flushed into one of the captured
+    segments and not deleted at or before the snapshot generation.
+    Scores equal bm25_score over the visible documents in doc-id order.
+    """
+
+    def __init__(self, segments, generation, num_docs, total_len, k1, b):
+        self.segments = segments
+        self.generation = generation
+        self.N = num_docs
+        self.total_len = total_len
+        self.k1 = k1
+        self.b = b
+        self.avgdl = total_len / num_docs if num_docs > 0 else 0.0
+        self._lives = None
+
+    def _live_masks(self):
+        if self._lives is None:
+            self._lives = [seg.deleted_gen > self.generation for seg in self.segments]
+        return self._lives
+
+    def doc_ids(self):
+        """
+        Returns int64 array of visible doc ids, ascending.
+        """
+        lives = self._live_masks()
+        if not self.segments:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([seg.doc_ids[live] for seg, live in zip(self.segments, lives)])
+
+    def score(self, query_tokens):
+        """
+        Returns (doc_ids, scores) numpy arrays over the visible documents.
+        """
+        lives = self._live_masks()
+        k1, b = self.k1, self.b
+
+        denom_bases = []
+        seg_scores = []
+        for seg in self.segments:
+            if self.avgdl > 0:
+                len_norm = (1 - b + b * (seg.doc_lens / self.avgdl))
+            else:
+                len_norm = np.ones(len(seg), dtype=float)
+            denom_bases.append(k1 * len_norm)
+            seg_scores.append(np.zeros(len(seg), dtype=float))
+
+        for term in dict.fromkeys(query_tokens):
+            hits = []
+            d = 0
+            for s_idx, (seg, live) in enumerate(zip(self.segments, lives)):
+                entry = seg.postings.get(term)
+                if entry is None:
+                    continue
+                local, tfs = entry
+                keep = live[local]
+                if keep.any():
+                    hits.append((s_idx, local[keep], tfs[keep]))
+                    d += int(keep.sum())
+            if d == 0:
+                continue
+            term_idf = math.log((self.N - d + 0.5) / (d + 0.5) + 1)
+            for s_idx, local, tfs in hits:
+                contrib = term_idf * tfs * (k1 + 1) / (tfs + denom_bases[s_idx][local])
+                seg_scores[s_idx][local] += contrib
+
+        if not self.segments:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=float)
+        scores = np.concatenate([sc[live] for sc, live in zip(seg_scores, lives)])
+        return self.doc_ids(), scores
+
+    def top_k(self, query_tokens, k=10):
+        """
+        Returns list of (doc_id, score) for the k best visible documents.
+        """
+        doc_ids, scores = self.score(query_tokens)
+        hit = scores > 0
+        doc_ids, scores = doc_ids[hit], scores[hit]
+        best = np.lexsort((doc_ids, -scores))[:max(k, 0)]
+        return [(int(doc_ids[i]), float(scores[i])) for i in best]
+
+
+# per-process state of a ShardedBM25 worker
+_shard_state = {}
+
+
+def _shard_init(docs, k1, b):
+    _shard_state["docs"] = docs
+    _shard_state["k1"] = k1
+    _shard_state["b"] = b
+
+
+def _shard_local_stats():
+    docs = _shard_state["docs"]
+    df = Counter()
+    for doc in docs:
+        df.update(set(doc))
+    return np.array([len(doc) for doc in docs], dtype=float), df
+
+
+def _shard_build(corpus_stats):
+    docs = _shard_state.pop("docs")
+    _shard_state["index"] = BM25Index(docs, _shard_state["k1"], _shard_state["b"], corpus_stats)
+
+
+def _shard_top_k(queries, k):
+    index = _shard_state["index"]
+    return [index.top_k(q, k) for q in queries]
+
+
+def _shard_score(query_tokens):
+    return _shard_state["index"].score(query_tokens)
+
+
+class ShardedBM25:
+    """
+    BM25 search over a corpus partitioned across worker processes.
+
+    Each shard is a contiguous slice of docs held by its own single-process
+    executor, which builds a BM25Index for it. Global N, avgdl and df are
+    gathered from the shards before the indexes are built, so shard scores
+    equal single-process BM25Index scores. Queries are scattered to every
+    shard and the per-shard top-k lists are combined with a k-way merge.
+    """
+
+    def __init__(self, docs, num_shards=None, k1=1.2, b=0.75):
+        num_shards = num_shards or os.cpu_count() or 1
+        num_shards = max(1, min(num_shards, len(docs)))
+        bounds = np.linspace(0, len(docs), num_shards + 1).astype(int)
+        self.offsets = bounds[:-1]
+
+        self._executors = [
+            ProcessPoolExecutor(max_workers=1, initializer=_shard_init,
+                                initargs=(docs[bounds[i]:bounds[i + 1]], k1, b))
+            for i in range(num_shards)
+        ]
+
+        stats = [f.result() for f in [ex.submit(_shard_local_stats) for ex in self._executors]]
+        doc_lens = np.concatenate([lens for lens, _ in stats])
+        N = len(doc_lens)
+        avgdl = doc_lens.mean() if N > 0 else 0.0
+        df = Counter()
+        for _, local_df in stats:
+            df.update(local_df)
+
+        # each shard only needs df of its own terms
+        futures = [
+            ex.submit(_shard_build, (N, avgdl, {t: df[t] for t in local_df}))
+            for ex, (_, local_df) in zip(self._executors, stats)
+        ]
+        for f in futures:
+            f.result()
+        self.N = N
+
+    def search(self, query_tokens, k=10):
+        """
+        Returns list of (doc_id, score) for the k best documents.
+        """
+        return self.search_batch([query_tokens], k)[0]
+
+    def search_batch(self, queries, k=10):
+        """
+        Returns one top-k list of (doc_id, score) per query. Each shard
+        receives the whole batch in one call.
+        """
+        queries = [list(q) for q in queries]
+        futures = [ex.submit(_shard_top_k, queries, k) for ex in self._executors]
+        per_shard = [f.result() for f in futures]
+
+        results = []
+        for qi in range(len(queries)):
+            lists = [
+                [(-score, int(doc) + int(offset)) for doc, score in shard[qi]]
+                for shard, offset in zip(per_shard, self.offsets)
+            ]
+            merged = heapq.merge(*lists)
+            results.append([(doc, -neg) for neg, doc in itertools.islice(merged, max(k, 0))])
+        return results
+
+    def score(self, query_tokens):
+        """
+        Returns numpy array of BM25 scores for each document.
+        """
+        futures = [ex.submit(_shard_score, list(query_tokens)) for ex in self._executors]
+        return np.concatenate([f.result() for f in futures])
+
+    def close(self):
+        for ex in self._executors:
+            ex.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _synthetic_corpus(num_docs, vocab_size=5000, mean_len=60, seed=0):
+    rng = np.random.default_rng(seed)
+    # zipf-like term distribution, as in natural text
+    ranks = np.arange(1, vocab_size + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    lens = rng.poisson(mean_len, size=num_docs) + 1
+    tokens = rng.choice(vocab_size, size=int(lens.sum()), p=probs)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    words = vocab[tokens].tolist()
+    bounds = np.concatenate(([0], np.cumsum(lens)))
+    docs = [words[bounds[i]:bounds[i + 1]] for i in range(num_docs)]
+    queries = [vocab[rng.choice(vocab_size, size=3, p=probs)].tolist() for _ in range(20)]
+    return docs, queries
+
+
+def benchmark_bm25(corpus_sizes=(1_000, 10_000, 50_000, 200_000), repeat=3):
+    """
+    Compares per-query latency of bm25_score against BM25Index.score,
+    exhaustive top-10 (score() plus partition) and BM25Index.top_k(k=10).
+    Returns list of (num_docs, bm25_score, BM25Index.score, exhaustive top-k,
+    BM25Index.top_k) seconds/query.
+    """
+    import time
+
+    def per_query(fn, queries, reps):
+        start = time.perf_counter()
+        for _ in range(reps):
+            for q in queries:
+                fn(q)
+        return (time.perf_counter() - start) / (reps * len(queries))
+
+    results = []
+    for num_docs in corpus_sizes:
+        docs, queries = _synthetic_corpus(num_docs)
+        index = BM25Index(docs)
+
+        # the loop baseline is timed once, it is orders of magnitude slower
+        baseline = per_query(lambda q: bm25_score(q, docs), queries[:5], 1)
+        indexed = per_query(index.score, queries, repeat)
+        exhaustive = per_query(lambda q: _exhaustive_top_k(index.score(q), 10), queries, repeat)
+        topk = per_query(lambda q: index.top_k(q, k=10), queries, repeat)
+
+        results.append((num_docs, baseline, indexed, exhaustive, topk))
+        print(f"docs={num_docs:>8}  bm25_score={baseline * 1e3:9.3f} ms/query  "
+              f"BM25Index={indexed * 1e3:9.3f} ms/query  exhaustive top-10={exhaustive * 1e3:9.3f} ms/query  "
+              f"top_k(10)={topk * 1e3:9.3f} ms/query  speedup={baseline / indexed:7.1f}x")
+
+    return results
+
+
+def benchmark_bm25_batch(num_docs=20_000, num_queries=2_000):
+    """
+    Compares throughput of bm25_score in a loop against BM25Index.score_batch.
+    Returns (bm25_score queries/sec, score_batch queries/sec).
+    """
+    import time
+
+    docs, _ = _synthetic_corpus(num_docs)
+    rng = np.random.default_rng(1)
+    queries = [[f"w{t}" for t in rng.integers(0, 5000, size=3)] for _ in range(num_queries)]
+    index = BM25Index(docs)
+    index._weight_matrix()
+
+    # the loop baseline is timed on a sample, it is orders of magnitude slower
+    sample = queries[:20]
+    start = time.perf_counter()
+    for q in sample:
+        bm25_score(q, docs)
+    loop_qps = len(sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    index.score_batch(queries)
+    batch_qps = num_queries / (time.perf_counter() - start)
+
+    print(f"docs={num_docs}  bm25_score loop={loop_qps:10.1f} queries/s  "
+          f"score_batch={batch_qps:10.1f} queries/s  speedup={batch_qps / loop_qps:7.1f}x")
+    return loop_qps, batch_qps
+
+
+def benchmark_bm25_sharded(num_docs=100_000, num_queries=2_000, shard_counts=None, k=10):
+    """
+    Measures ShardedBM25.search_batch throughput as the shard count grows.
+    Returns list of (num_shards, queries/sec).
+    """
+    import time
+
+    if shard_counts is None:
+        cores = os.cpu_count() or 1
+        shard_counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    docs, _ = _synthetic_corpus(num_docs)
+    rng = np.random.default_rng(1)
+    queries = [[f"w{t}" for t in rng.integers(0, 5000, size=3)] for _ in range(num_queries)]
+
+    results = []
+    for num_shards in shard_counts:
+        with ShardedBM25(docs, num_shards=num_shards) as sharded:
+            start = time.perf_counter()
+            sharded.search_batch(queries, k)
+            qps = num_queries / (time.perf_counter() - start)
+        results.append((num_shards, qps))
+        print(f"shards={num_shards:>3}  {qps:10.1f} queries/s  scaling={qps / results[0][1]:5.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_bm25()
+    benchmark_bm25_batch()
+    benchmark_bm25_sharded()
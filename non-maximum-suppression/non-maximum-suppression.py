@@ -1,3 +1,8 @@
+import time
+
+import numpy as np
+
+
 def nms(boxes, scores, iou_threshold):
     """
     Apply Non-Maximum Suppression.
@@ -50,4 +55,164 @@ def nms(boxes, scores, iou_threshold):
                 suppressed[other] = True
 
     return keep
-    
\ No newline at end of file
+
+
+def _iou_one_to_many(box, boxes, areas, area):
+    """
+    IoU of one box against an (M, 4) array; a zero union gives IoU 0 as in nms.
+    """
+    w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0.0, None)
+    h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0.0, None)
+    inter = w * h
+    union = area + areas - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union != 0)
+
+
+def _top_k(scores, top_k):
+    """
+    Indices of the top_k highest scores (all when top_k is None), by
+    descending score with ties in input order.
+    """
+    order = np.argsort(-scores, kind="stable")
+    return order if top_k is None else order[:top_k]
+
+
+def nms_vectorized(boxes, scores, iou_threshold, top_k=None, max_output=None):
+    """
+    Vectorized greedy Non-Maximum Suppression with the results of nms.
+    boxes: (N, 4) array of (x1, y1, x2, y2); scores: (N,).
+    Each round keeps the best remaining box, computes its IoU against all
+    remaining candidates at once and drops those at or above
+    iou_threshold, so the candidate set shrinks every round.
+    top_k: only the top_k highest-scoring boxes enter NMS.
+    max_output: stop after this many boxes are kept.
+    Returns int64 indices of kept boxes by descending score.
+    """
+    return _greedy_nms(boxes, scores, iou_threshold, top_k, max_output)
+
+
+def _greedy_nms(boxes, scores, iou_threshold, top_k=None, max_output=None, class_ids=None):
+    """
+    Greedy NMS loop of nms_vectorized; with class_ids, a box only
+    suppresses boxes of its own class.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    order = _top_k(scores, top_k)
+    keep = []
+    while order.size and (max_output is None or len(keep) < max_output):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iou = _iou_one_to_many(boxes[i], boxes[rest], areas[rest], areas[i])
+        suppress = iou >= iou_threshold
+        if class_ids is not None:
+            suppress &= class_ids[rest] == class_ids[i]
+        order = rest[~suppress]
+    return np.array(keep, dtype=np.int64)
+
+
+def soft_nms(boxes, scores, iou_threshold=0.3, sigma=0.5, method="gaussian",
+             score_threshold=1e-3, top_k=None, max_output=None):
+    """
+    Soft-NMS: overlapping boxes have their scores decayed instead of being
+    removed.
+    method="linear" multiplies scores by (1 - IoU) when IoU >= iou_threshold;
+    method="gaussian" multiplies every score by exp(-IoU**2 / sigma).
+    Boxes whose score falls below score_threshold are dropped.
+    Returns (int64 indices of kept boxes in selection order, their decayed scores).
+    """
+    if method not in ("linear", "gaussian"):
+        raise ValueError('method must be "linear" or "gaussian"')
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    order = _top_k(scores, top_k)
+    order = order[scores[order] >= score_threshold]
+    current = scores[order]
+    keep, kept_scores = [], []
+    while order.size and (max_output is None or len(keep) < max_output):
+        best = int(np.argmax(current))
+        i = order[best]
+        keep.append(i)
+        kept_scores.append(current[best])
+
+        order = np.delete(order, best)
+        current = np.delete(current, best)
+        iou = _iou_one_to_many(boxes[i], boxes[order], areas[order], areas[i])
+        if method == "linear":
+            current = current * np.where(iou >= iou_threshold, 1.0 - iou, 1.0)
+        else:
+            current = current * np.exp(-(iou * iou) / sigma)
+
+        alive = current >= score_threshold
+        order = order[alive]
+        current = current[alive]
+    return np.array(keep, dtype=np.int64), np.array(kept_scores, dtype=np.float64)
+
+
+def batched_nms(boxes, scores, class_ids, iou_threshold, top_k=None, max_output=None,
+                method="hard", sigma=0.5, score_threshold=1e-3):
+    """
+    Class-aware NMS in a single pass: boxes of each class are shifted by
+    class_id times the coordinate span, so boxes of different classes never
+    overlap and cannot suppress each other. Hard NMS also compares class
+    ids, since a zero IoU still reaches an iou_threshold <= 0.
+    method: "hard" (nms_vectorized), or "linear" / "gaussian" (soft_nms).
+    Returns kept indices, plus the decayed scores for soft methods.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    class_ids = np.asarray(class_ids).reshape(-1)
+    if boxes.size:
+        span = boxes.max() - boxes.min() + 1.0
+        boxes = boxes + (class_ids.astype(np.float64) * span)[:, None]
+
+    if method == "hard":
+        return _greedy_nms(boxes, scores, iou_threshold, top_k, max_output, class_ids)
+    return soft_nms(boxes, scores, iou_threshold, sigma, method, score_threshold, top_k, max_output)
+
+
+def benchmark_nms(n=2000, iou_threshold=0.5, num_classes=20):
+    """
+    Times nms against nms_vectorized and batched_nms on n random boxes
+    clustered around a few centers so that suppression does real work.
+    Returns dict of seconds per call.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1000, (n // 20 + 1, 2))[rng.integers(0, n // 20 + 1, n)]
+    xy = centers + rng.normal(0, 10, (n, 2))
+    wh = rng.uniform(20, 80, (n, 2))
+    boxes = np.concatenate((xy, xy + wh), axis=1)
+    scores = rng.random(n)
+    classes = rng.integers(0, num_classes, n)
+
+    start = time.perf_counter()
+    ref = nms(boxes.tolist(), scores.tolist(), iou_threshold)
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keep = nms_vectorized(boxes, scores, iou_threshold)
+    t_vec = time.perf_counter() - start
+    if keep.tolist() != ref:
+        raise AssertionError("nms_vectorized mismatch")
+
+    start = time.perf_counter()
+    batched_nms(boxes, scores, classes, iou_threshold)
+    t_batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    soft_nms(boxes, scores)
+    t_soft = time.perf_counter() - start
+
+    print(f"nms             {t_loop * 1e3:9.1f} ms")
+    print(f"nms_vectorized  {t_vec * 1e3:9.1f} ms  speedup={t_loop / t_vec:7.1f}x")
+    print(f"batched_nms     {t_batched * 1e3:9.1f} ms  ({num_classes} classes)")
+    print(f"soft_nms        {t_soft * 1e3:9.1f} ms")
+    return {"loop": t_loop, "vectorized": t_vec, "batched": t_batched, "soft": t_soft}
+
+
+if __name__ == "__main__":
+    benchmark_nms()
@@ -1,4 +1,5 @@
 import numpy as np
+from itertools import chain
 
 def pad_sequences(seqs, pad_value=0, max_len=None):
     """
@@ -21,3 +22,113 @@ def pad_sequences(seqs, pad_value=0, max_len=None):
         result[i, :len(trunc_seq)] = trunc_seq
 
     return result
+
+
+def to_ragged(seqs, dtype=np.int32):
+    """
+    Returns (values, offsets): all sequences concatenated, and int64 offsets
+    of shape (N + 1,) so that seqs[i] == values[offsets[i]:offsets[i + 1]].
+    """
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    offsets = np.zeros(len(seqs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter(chain.from_iterable(seqs), dtype=dtype, count=int(offsets[-1]))
+    return values, offsets
+
+
+def pad_ragged(values, offsets, pad_value=0, max_len=None, rows=None, dtype=np.int32):
+    """
+    Returns a padded array of shape (len(rows), L) from ragged (values, offsets),
+    filled with a single vectorized scatter. rows selects and orders the
+    sequences (default: all); L is max_len if given, else the longest selected.
+    """
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    if rows is not None:
+        starts = starts[rows]
+        lengths = lengths[rows]
+
+    L = int(lengths.max(initial=0)) if max_len is None else max_len
+    lengths = np.minimum(lengths, L)
+    result = np.full((len(lengths), L), pad_value, dtype=dtype)
+
+    row_idx = np.repeat(np.arange(len(lengths)), lengths)
+    col_idx = np.arange(len(row_idx)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    result[row_idx, col_idx] = values[np.repeat(starts, lengths) + col_idx]
+
+    return result
+
+
+def bucket_batches(seqs, batch_size, boundaries=None, pad_value=0, shuffle=False, seed=None):
+    """
+    Yields (indices, padded) batches of sequences with similar lengths.
+    padded is an int32 array of shape (len(indices), L) with L the longest
+    sequence in the batch, and indices are positions in seqs.
+    Without boundaries, sequences are sorted by length and cut into batches.
+    With boundaries, sequences are first grouped into the length buckets
+    np.digitize(length, boundaries) and batched within each bucket.
+    shuffle randomizes the order of the batches and the bucket contents.
+    """
+    values, offsets = to_ragged(seqs)
+    lengths = np.diff(offsets)
+    rng = np.random.default_rng(seed)
+
+    if boundaries is None:
+        keys = lengths
+    else:
+        keys = np.digitize(lengths, boundaries)
+    if shuffle:
+        # random order inside each key, then stable sort by key
+        order = rng.permutation(len(seqs))
+        order = order[np.argsort(keys[order], kind="stable")]
+    else:
+        order = np.argsort(keys, kind="stable")
+
+    if boundaries is None:
+        # one sorted run, batches may span neighbouring lengths
+        groups = [order]
+    else:
+        sorted_keys = keys[order]
+        cuts = np.flatnonzero(np.diff(sorted_keys)) + 1
+        groups = np.split(order, cuts)
+    batches = [g[i:i + batch_size] for g in groups for i in range(0, len(g), batch_size)]
+
+    if shuffle:
+        batches = [batches[i] for i in rng.permutation(len(batches))]
+
+    for idx in batches:
+        yield idx, pad_ragged(values, offsets, pad_value, rows=idx)
+
+
+def benchmark_padding(num_seqs=50000, batch_size=64, seed=0):
+    """
+    Reports padding ratio (pad slots / total slots) and sequences/sec of
+    pad_sequences over all sequences against bucket_batches, on lengths
+    drawn from a skewed (log-normal) distribution.
+    """
+    import time
+
+    rng = np.random.default_rng(seed)
+    lengths = np.minimum(rng.lognormal(3.0, 1.0, size=num_seqs).astype(int) + 1, 2048)
+    seqs = [rng.integers(1, 30000, size=n).tolist() for n in lengths]
+    total_tokens = int(lengths.sum())
+
+    start = time.perf_counter()
+    padded = pad_sequences(seqs)
+    base_time = time.perf_counter() - start
+    base_ratio = 1 - total_tokens / padded.size
+
+    start = time.perf_counter()
+    slots = 0
+    for _, batch in bucket_batches(seqs, batch_size):
+        slots += batch.size
+    bucket_time = time.perf_counter() - start
+    bucket_ratio = 1 - total_tokens / slots
+
+    print(f"pad_sequences : padding ratio {base_ratio:6.1%}  {num_seqs / base_time:12.0f} seqs/s")
+    print(f"bucket_batches: padding ratio {bucket_ratio:6.1%}  {num_seqs / bucket_time:12.0f} seqs/s")
+    return (base_ratio, num_seqs / base_time), (bucket_ratio, num_seqs / bucket_time)
+
+
+if __name__ == "__main__":
+    benchmark_padding()
@@ -0,0 +1,155 @@
+import importlib.util
+import os
+import time
+
+import numpy as np
+
+
+def _pair(v):
+    return (v, v) if np.isscalar(v) else tuple(v)
+
+
+def _windows(x, kernel_size, stride):
+    """
+    Returns a window view of x and the two axes to reduce over.
+    Non-overlapping windows (stride == kernel) are a plain reshape of the
+    cropped input, (N, C, OH, KH, OW, KW); other strides use an as_strided
+    view, (N, C, OH, OW, KH, KW). Neither copies the input.
+    """
+    N, C, H, W = x.shape
+    kh, kw = kernel_size
+    sh, sw = stride
+    OH = (H - kh) // sh + 1
+    OW = (W - kw) // sw + 1
+    if OH <= 0 or OW <= 0:
+        raise ValueError("pooling window larger than input")
+
+    if (sh, sw) == (kh, kw):
+        return x[:, :, :OH * kh, :OW * kw].reshape(N, C, OH, kh, OW, kw), (3, 5)
+
+    sN, sC, sH, sW = x.strides
+    v = np.lib.stride_tricks.as_strided(
+        x, shape=(N, C, OH, OW, kh, kw),
+        strides=(sN, sC, sH * sh, sW * sw, sH, sW), writeable=False)
+    return v, (4, 5)
+
+
+def pool2d(x, kernel_size, stride=None, mode="max", return_indices=False):
+    """
+    2D pooling over a batched (N, C, H, W) array.
+    mode: "max", "avg" or "sum". stride defaults to kernel_size.
+    return_indices (max only): also returns the argmax of each window as a
+    flat index into H * W, as used by max-unpooling in the backward pass.
+    """
+    x = np.asarray(x)
+    if x.ndim != 4:
+        raise ValueError("x must be (N, C, H, W)")
+    if mode not in ("max", "avg", "sum"):
+        raise ValueError('mode must be "max", "avg" or "sum"')
+    if return_indices and mode != "max":
+        raise ValueError("return_indices requires mode='max'")
+    kernel_size = _pair(kernel_size)
+    stride = kernel_size if stride is None else _pair(stride)
+
+    v, axes = _windows(x, kernel_size, stride)
+    kh, kw = kernel_size
+
+    def tap(a, b):
+        # (N, C, OH, OW) slice holding offset (a, b) of every window
+        index = [slice(None)] * v.ndim
+        index[axes[0]], index[axes[1]] = a, b
+        return v[tuple(index)]
+
+    # fold the kh * kw window taps with whole-array ufuncs; this is much
+    # faster than a multi-axis reduction over the strided window view
+    y = np.array(tap(0, 0), dtype=np.result_type(x.dtype, np.float32) if mode == "avg" else x.dtype)
+    arg = np.zeros(y.shape, dtype=np.int64) if return_indices else None
+    for a in range(kh):
+        for b in range(kw):
+            if a == 0 and b == 0:
+                continue
+            t = tap(a, b)
+            if mode != "max":
+                y += t
+            elif return_indices:
+                better = t > y
+                np.copyto(y, t, where=better)
+                arg[better] = a * kw + b
+            else:
+                np.maximum(y, t, out=y)
+
+    if mode == "avg":
+        y /= kh * kw
+    if not return_indices:
+        return y
+
+    a, b = np.divmod(arg, kw)
+    OH, OW = y.shape[2], y.shape[3]
+    rows = np.arange(OH).reshape(OH, 1) * stride[0] + a
+    cols = np.arange(OW) * stride[1] + b
+    return y, rows * x.shape[3] + cols
+
+
+def global_pool2d(x, mode="avg"):
+    """
+    Global pooling of a (N, C, H, W) array to (N, C).
+    mode: "max", "avg" or "sum".
+    """
+    x = np.asarray(x)
+    if mode == "max":
+        return x.max(axis=(2, 3))
+    if mode == "sum":
+        return x.sum(axis=(2, 3))
+    if mode == "avg":
+        return x.mean(axis=(2, 3))
+    raise ValueError('mode must be "max", "avg" or "sum"')
+
+
+def _load_sibling(folder, name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", folder, folder + ".py")
+    spec = importlib.util.spec_from_file_location(folder, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+def benchmark_pooling(size=224, pool=2, repeats=3):
+    """
+    Times pool2d against the list-based max-pooling-2d, maxpool-forward
+    and average-pooling-2d on one size x size map.
+    Returns list of (name, list seconds, numpy seconds, speedup).
+    """
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((1, 1, size, size))
+    X = x[0, 0].tolist()
+
+    cases = [
+        ("max-pooling-2d", _load_sibling("max-pooling-2d", "max_pooling_2d"), (X, pool),
+         lambda: pool2d(x, pool, mode="max")),
+        ("maxpool-forward", _load_sibling("maxpool-forward", "maxpool_forward"), (X, pool + 1, pool),
+         lambda: pool2d(x, pool + 1, pool, mode="max")),
+        ("average-pooling-2d", _load_sibling("average-pooling-2d", "average_pooling_2d"), (X, pool),
+         lambda: pool2d(x, pool, mode="avg")),
+    ]
+
+    def best(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    results = []
+    for name, list_fn, args, np_fn in cases:
+        if not np.allclose(list_fn(*args), np_fn()[0, 0]):
+            raise AssertionError(f"{name} mismatch")
+        t_list = best(lambda: list_fn(*args))
+        t_np = best(np_fn)
+        results.append((name, t_list, t_np, t_list / t_np))
+        print(f"{name:<20} list={t_list * 1e3:8.2f} ms  numpy={t_np * 1e3:7.3f} ms  speedup={t_list / t_np:7.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_pooling()
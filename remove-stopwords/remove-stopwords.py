@@ -1,3 +1,5 @@
+import numpy as np
+
 def remove_stopwords(tokens, stopwords):
     """
     Returns: list[str] - tokens with stopwords removed (preserve order)
@@ -5,3 +7,32 @@ def remove_stopwords(tokens, stopwords):
     stop_set = set(stopwords)
 
     return [token for token in tokens if token not in stop_set]
+
+
+def stopword_keep_mask(vocab_size, stopword_ids):
+    """
+    Returns: np.ndarray of shape (vocab_size,), dtype=bool - False at stopword ids.
+    Build once per vocabulary and reuse for every batch.
+    """
+    keep_mask = np.ones(vocab_size, dtype=bool)
+    keep_mask[np.asarray(stopword_ids, dtype=np.int64)] = False
+    return keep_mask
+
+
+def remove_stopword_ids(values, keep_mask, offsets=None):
+    """
+    Returns: token-id array with stopwords removed (preserve order).
+    With ragged offsets of shape (N + 1,) for a batch of N sequences,
+    returns (values, offsets) of the filtered batch.
+    """
+    values = np.asarray(values)
+    keep = keep_mask[values]
+    filtered = values[keep]
+
+    if offsets is None:
+        return filtered
+
+    # kept tokens before each original offset become the new offsets
+    kept_before = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept_before[1:])
+    return filtered, kept_before[np.asarray(offsets)]
@@ -1,4 +1,8 @@
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 def roi_pool(feature_map, rois, output_size):
     """
@@ -40,3 +44,271 @@ def roi_pool(feature_map, rois, output_size):
         results.append(grid)
 
     return results
+
+
+def _pair(v):
+    return (v, v) if np.isscalar(v) else tuple(v)
+
+
+def _map_roi_chunks(fn, rois, out, chunk_size, num_workers, order=None):
+    """
+    Applies fn to chunks of ROIs, consecutive or taken in the given order,
+    on a thread pool when num_workers > 1, and writes each result into
+    its ROIs' rows of out. Returns out.
+    """
+    def run(i):
+        sel = slice(i, i + chunk_size) if order is None else order[i:i + chunk_size]
+        out[sel] = fn(rois[sel])
+
+    starts = range(0, len(rois), chunk_size)
+    if num_workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(num_workers) as pool:
+            list(pool.map(run, starts))
+    else:
+        for i in starts:
+            run(i)
+    return out
+
+
+def _roi_bins(rois, H, W, ph, pw, spatial_scale):
+    """
+    Batch indices and (start, end) rows and columns of every roi_pool bin,
+    computed for all ROIs at once; empty bins are widened to one pixel.
+    """
+    b = rois[:, 0].astype(np.int64)
+    x1, y1, x2, y2 = (np.floor(rois[:, k] * spatial_scale + 0.5).astype(np.int64) for k in range(1, 5))
+    x1 = np.clip(x1, 0, W - 1)
+    y1 = np.clip(y1, 0, H - 1)
+    roi_w = np.clip(x2, x1, W) - x1
+    roi_h = np.clip(y2, y1, H) - y1
+
+    i = np.arange(ph + 1)
+    j = np.arange(pw + 1)
+    h = y1[:, None] + (i * roi_h[:, None]) // ph
+    w = x1[:, None] + (j * roi_w[:, None]) // pw
+    hs, ws = h[:, :-1], w[:, :-1]
+    return b, hs, np.maximum(h[:, 1:], hs + 1), ws, np.maximum(w[:, 1:], ws + 1)
+
+
+def _max_sparse_table(F, levels_h, levels_w):
+    """
+    T[a, c, n, y, x] = max of F[n, y:y + 2**a, x:x + 2**c] for the
+    channels-last features F (N, H, W, C); windows running past the edge
+    are never queried and hold partial maxima.
+    """
+    T = np.empty((levels_h, levels_w) + F.shape, dtype=F.dtype)
+    T[0, 0] = F
+    for a in range(1, levels_h):
+        k = 1 << (a - 1)
+        T[a, 0] = T[a - 1, 0]
+        np.maximum(T[a - 1, 0, :, :-k], T[a - 1, 0, :, k:], out=T[a, 0, :, :-k])
+    for c in range(1, levels_w):
+        k = 1 << (c - 1)
+        T[:, c] = T[:, c - 1]
+        np.maximum(T[:, c - 1, :, :, :-k], T[:, c - 1, :, :, k:], out=T[:, c, :, :, :-k])
+    return T
+
+
+def _window_starts(start, end, level):
+    """
+    Starts of the 2**level windows covering every segment [start, end):
+    evenly spaced, with the last window ending at end. Segments needing
+    fewer windows than the longest repeat their last one.
+    """
+    size = 1 << level
+    count = int(((end - start + size - 1) // size).max())
+    return [np.minimum(start + k * size, end - size) for k in range(count)]
+
+
+def _roi_pool_chunk(T, rois, ph, pw, spatial_scale):
+    """
+    ROI max pooling of one chunk of ROIs from the sparse table T: each
+    bin is the max of overlapping power-of-two windows covering it, four
+    when the table holds levels up to the bin size.
+    """
+    levels_h, levels_w, N, H, W, C = T.shape
+    b, hs, he, ws, we = _roi_bins(rois, H, W, ph, pw, spatial_scale)
+    a = np.minimum(np.log2(he - hs).astype(np.int64), levels_h - 1)
+    c = np.minimum(np.log2(we - ws).astype(np.int64), levels_w - 1)
+    rows = _window_starts(hs, he, a)
+    cols = _window_starts(ws, we, c)
+
+    flat = T.reshape(-1, C)
+    base = (a[:, :, None] * levels_w + c[:, None, :]) * N + b[:, None, None]
+    out = None
+    for y in rows:
+        for x in cols:
+            part = flat.take(((base * H + y[:, :, None]) * W + x[:, None, :]).ravel(), axis=0)
+            out = part if out is None else np.maximum(out, part, out=out)
+    return out.reshape(len(rois), ph, pw, C).transpose(0, 3, 1, 2)
+
+
+def _table_levels(max_h, max_w, copies):
+    """
+    Sparse-table levels (levels_h, levels_w), at most copies tables in
+    total, minimizing the windows per bin of size (max_h, max_w).
+    """
+    need_h = int(np.log2(max_h)) + 1
+    need_w = int(np.log2(max_w)) + 1
+    best = None
+    for lh in range(1, min(need_h, copies) + 1):
+        lw = min(need_w, copies // lh)
+        cost = (-(-max_h // (1 << (lh - 1))) * -(-max_w // (1 << (lw - 1))), lh * lw)
+        if best is None or cost < best[0]:
+            best = (cost, lh, lw)
+    return best[1], best[2]
+
+
+def roi_pool_batched(features, rois, output_size, spatial_scale=1.0, num_workers=1, chunk_size=128,
+                     max_bytes=64 << 20):
+    """
+    Batched ROI max pooling with the bins of roi_pool.
+    features: (N, C, H, W) array.
+    rois: (R, 5) array of (batch_index, x1, y1, x2, y2), scaled by
+    spatial_scale and rounded to feature-map pixels.
+    Bin boundaries of all ROIs are computed at once. Bins are reduced by
+    a segment max over a 2D sparse table of power-of-two window maxima,
+    which costs log2(max bin height) * log2(max bin width) copies of the
+    features. max_bytes caps the table (at least one copy); bins longer
+    than its largest windows are covered by more of them. Chunks of
+    chunk_size ROIs run on num_workers threads.
+    Returns (R, C, out_h, out_w).
+    """
+    features = np.asarray(features)
+    rois = np.asarray(rois, dtype=np.float64).reshape(-1, 5)
+    N, C, H, W = features.shape
+    ph, pw = _pair(output_size)
+    if len(rois) == 0:
+        return np.empty((0, C, ph, pw), dtype=features.dtype)
+
+    _, hs, he, ws, we = _roi_bins(rois, H, W, ph, pw, spatial_scale)
+    bin_h = (he - hs).max(axis=1)
+    bin_w = (we - ws).max(axis=1)
+    levels_h, levels_w = _table_levels(int(bin_h.max()), int(bin_w.max()),
+                                       max(1, max_bytes // max(1, features.nbytes)))
+    T = _max_sparse_table(np.ascontiguousarray(features.transpose(0, 2, 3, 1)), levels_h, levels_w)
+
+    # chunks of similar bin sizes need similar numbers of windows
+    order = np.lexsort((bin_w, bin_h))
+    out = np.empty((len(rois), C, ph, pw), dtype=features.dtype)
+    return _map_roi_chunks(lambda c: _roi_pool_chunk(T, c, ph, pw, spatial_scale),
+                           rois, out, chunk_size, num_workers, order)
+
+
+def _bilinear_taps(coords, size):
+    """
+    Low/high neighbour indices and weights of bilinear sample points along
+    one axis; points more than one pixel outside the map get zero weight.
+    """
+    valid = (coords >= -1.0) & (coords <= size)
+    c = np.maximum(coords, 0.0)
+    low = np.floor(c).astype(np.int64)
+    edge = low >= size - 1
+    low = np.where(edge, size - 1, low)
+    high = np.where(edge, size - 1, low + 1)
+    c = np.where(edge, low, c)
+    frac = c - low
+    return low, high, (1.0 - frac) * valid, frac * valid
+
+
+def _roi_align_chunk(F, rois, ph, pw, spatial_scale, sampling_ratio, aligned):
+    """
+    ROI Align of one chunk of ROIs over F, the (N, H, W, C) channels-last features.
+    """
+    _, H, W, C = F.shape
+    R = len(rois)
+    s = sampling_ratio
+    offset = 0.5 if aligned else 0.0
+    b = rois[:, 0].astype(np.int64)
+    x1, y1, x2, y2 = (rois[:, k] * spatial_scale - offset for k in range(1, 5))
+    roi_w = x2 - x1
+    roi_h = y2 - y1
+    if not aligned:
+        roi_w = np.maximum(roi_w, 1.0)
+        roi_h = np.maximum(roi_h, 1.0)
+
+    # s x s regularly spaced sample points per bin, separable in y and x
+    steps = (np.arange(ph * s) + 0.5) / s
+    ys = y1[:, None] + steps / ph * roi_h[:, None]
+    steps = (np.arange(pw * s) + 0.5) / s
+    xs = x1[:, None] + steps / pw * roi_w[:, None]
+    y_lo, y_hi, wy_lo, wy_hi = _bilinear_taps(ys, H)
+    x_lo, x_hi, wx_lo, wx_hi = _bilinear_taps(xs, W)
+
+    flat = F.reshape(-1, C)
+    base = b[:, None, None] * H
+    acc = np.zeros((R, ph * s, pw * s, C), dtype=np.result_type(F.dtype, np.float32))
+    for yi, wy in ((y_lo, wy_lo), (y_hi, wy_hi)):
+        for xi, wx in ((x_lo, wx_lo), (x_hi, wx_hi)):
+            corner = flat.take(((base + yi[:, :, None]) * W + xi[:, None, :]).ravel(), axis=0)
+            corner = corner.reshape(acc.shape)
+            corner *= (wy[:, :, None] * wx[:, None, :])[..., None]
+            acc += corner
+
+    # average the s x s sample points of each bin
+    out = acc.reshape(R, ph, s, pw * s, C).sum(axis=2).reshape(R, ph, pw, s, C).sum(axis=3)
+    out /= s * s
+    return out.transpose(0, 3, 1, 2).astype(F.dtype, copy=False)
+
+
+def roi_align(features, rois, output_size, spatial_scale=1.0, sampling_ratio=2, aligned=False,
+              num_workers=1, chunk_size=16):
+    """
+    Batched ROI Align: each bin averages sampling_ratio x sampling_ratio
+    bilinearly interpolated points instead of max-pooling whole pixels.
+    features: (N, C, H, W) array; rois: (R, 5) of (batch_index, x1, y1, x2, y2).
+    aligned=True shifts ROI coordinates by -0.5 pixel (pixel-center model).
+    Chunks of chunk_size ROIs run on num_workers threads.
+    Returns (R, C, out_h, out_w).
+    """
+    features = np.asarray(features)
+    rois = np.asarray(rois, dtype=np.float64).reshape(-1, 5)
+    C = features.shape[1]
+    ph, pw = _pair(output_size)
+    F = np.ascontiguousarray(features.transpose(0, 2, 3, 1))
+
+    out = np.empty((len(rois), C, ph, pw), dtype=features.dtype)
+    return _map_roi_chunks(
+        lambda c: _roi_align_chunk(F, c, ph, pw, spatial_scale, sampling_ratio, aligned),
+        rois, out, chunk_size, num_workers)
+
+
+def benchmark_roi_pool(num_rois=2000, channels=256, size=50, output_size=7, num_workers=1):
+    """
+    Times roi_pool (one channel, Python loops) against roi_pool_batched and
+    roi_align on num_rois random ROIs over a (1, channels, size, size) map.
+    Returns dict of seconds per call.
+    """
+    rng = np.random.default_rng(0)
+    features = rng.standard_normal((1, channels, size, size))
+    x1 = rng.integers(0, size - 2, num_rois)
+    y1 = rng.integers(0, size - 2, num_rois)
+    x2 = np.minimum(x1 + rng.integers(1, size // 2, num_rois), size)
+    y2 = np.minimum(y1 + rng.integers(1, size // 2, num_rois), size)
+    rois = np.stack((np.zeros(num_rois), x1, y1, x2, y2), axis=1)
+
+    fmap = features[0, 0].tolist()
+    boxes = rois[:, 1:].astype(int).tolist()
+    start = time.perf_counter()
+    ref = roi_pool(fmap, boxes, output_size)
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out = roi_pool_batched(features, rois, output_size, num_workers=num_workers)
+    t_batched = time.perf_counter() - start
+    if not np.array_equal(out[:, 0], np.array(ref)):
+        raise AssertionError("roi_pool_batched mismatch")
+
+    start = time.perf_counter()
+    roi_align(features, rois, output_size, num_workers=num_workers)
+    t_align = time.perf_counter() - start
+
+    print(f"roi_pool (1 channel)         {t_loop * 1e3:9.1f} ms")
+    print(f"roi_pool_batched ({channels} ch)  {t_batched * 1e3:9.1f} ms  "
+          f"per-channel speedup={t_loop * channels / t_batched:8.0f}x")
+    print(f"roi_align ({channels} ch)         {t_align * 1e3:9.1f} ms")
+    return {"loop": t_loop, "batched": t_batched, "align": t_align}
+
+
+if __name__ == "__main__":
+    benchmark_roi_pool()
@@ -1,3 +1,8 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import numpy as np
 
 def conv2d(x, W, b):
@@ -17,3 +22,326 @@ def conv2d(x, W, b):
     y = y + b.reshape(1, C_out, 1, 1)
 
     return y
+
+
+def _pair(v):
+    return (v, v) if np.isscalar(v) else tuple(v)
+
+
+def _next_fast_len(n):
+    # smallest 2^a * 3^b * 5^c >= n, FFT sizes pocketfft handles fastest
+    best = 1 << max(0, (n - 1).bit_length())
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            m = p35
+            while m < n:
+                m *= 2
+            best = min(best, m)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def _conv2d_im2col(xp, W, stride, dilation, groups, OH, OW):
+    """
+    Cross-correlation of padded input xp via im2col + GEMM.
+    The column matrix is a strided view reshaped once per group; the product
+    runs in BLAS through np.matmul.
+    """
+    N, C, _, _ = xp.shape
+    C_out, C_g, KH, KW = W.shape
+    sh, sw = stride
+    dh, dw = dilation
+    sN, sC, sH, sW = xp.strides
+
+    windows = np.lib.stride_tricks.as_strided(
+        xp, shape=(N, OH, OW, C, KH, KW),
+        strides=(sN, sH * sh, sW * sw, sC, sH * dh, sW * dw), writeable=False)
+
+    O_g = C_out // groups
+    y = np.empty((N, C_out, OH, OW), dtype=xp.dtype)
+    for g in range(groups):
+        cols = windows[:, :, :, g * C_g:(g + 1) * C_g].reshape(N * OH * OW, C_g * KH * KW)
+        Wg = W[g * O_g:(g + 1) * O_g].reshape(O_g, C_g * KH * KW)
+        y[:, g * O_g:(g + 1) * O_g] = (cols @ Wg.T).reshape(N, OH, OW, O_g).transpose(0, 3, 1, 2)
+    return y
+
+
+def _kernel_spectrum(W, dilation, fh, fw):
+    """
+    Conjugate real FFT of the dilated kernel at FFT size (fh, fw).
+    """
+    C_out, C_g, KH, KW = W.shape
+    dh, dw = dilation
+    # dilation inserts zeros between kernel taps
+    Wdil = np.zeros((C_out, C_g, (KH - 1) * dh + 1, (KW - 1) * dw + 1), dtype=W.dtype)
+    Wdil[:, :, ::dh, ::dw] = W
+    # one output channel at a time: rfft2 transients are several times its result
+    K = np.empty((C_out, C_g, fh, fw // 2 + 1), dtype=np.result_type(W.dtype, np.complex64))
+    for o in range(C_out):
+        K[o] = np.conj(np.fft.rfft2(Wdil[o], s=(fh, fw)))
+    return K
+
+
+def _conv2d_fft(xp, W, stride, dilation, groups, OH, OW, spectrum=None):
+    """
+    Cross-correlation of padded input xp via real FFTs: the dilated kernel
+    and the input are transformed once, multiplied with the kernel's
+    conjugate and summed over input channels in the frequency domain.
+    spectrum: optional precomputed (fh, fw, _kernel_spectrum(W, dilation, fh, fw))
+    with fh, fw at least the input size, reused across calls.
+    """
+    N, C, H, Wd = xp.shape
+    C_out, C_g, KH, KW = W.shape
+    sh, sw = stride
+    dh, dw = dilation
+    KHd, KWd = (KH - 1) * dh + 1, (KW - 1) * dw + 1
+
+    # circular correlation is exact for valid outputs when the FFT covers the input
+    if spectrum is None:
+        fh, fw = _next_fast_len(H), _next_fast_len(Wd)
+        K = _kernel_spectrum(W, dilation, fh, fw)
+    else:
+        fh, fw, K = spectrum
+    X = np.fft.rfft2(xp, s=(fh, fw))
+
+    O_g = C_out // groups
+    Hv, Wv = H - KHd + 1, Wd - KWd + 1
+    y = np.empty((N, C_out, OH, OW), dtype=xp.dtype)
+    for g in range(groups):
+        Yg = np.einsum("nchw,ochw->nohw", X[:, g * C_g:(g + 1) * C_g], K[g * O_g:(g + 1) * O_g])
+        full = np.fft.irfft2(Yg, s=(fh, fw))[:, :, :Hv:sh, :Wv:sw]
+        y[:, g * O_g:(g + 1) * O_g] = full[:, :, :OH, :OW]
+    return y
+
+
+def _resolve_padding(padding, stride, KHd, KWd):
+    """
+    Returns ((top, bottom), (left, right)) for an int, pair, "valid" or "same" padding.
+    """
+    if padding == "valid":
+        return (0, 0), (0, 0)
+    if padding == "same":
+        if stride != (1, 1):
+            raise ValueError('padding="same" requires stride 1')
+        return ((KHd - 1) // 2, KHd - 1 - (KHd - 1) // 2), ((KWd - 1) // 2, KWd - 1 - (KWd - 1) // 2)
+    ph, pw = _pair(padding)
+    return (ph, ph), (pw, pw)
+
+
+_BACKENDS = {"im2col": _conv2d_im2col, "fft": _conv2d_fft}
+
+# (backend-relevant shape key) -> fastest backend, filled by backend="autotune"
+_autotune_cache = {}
+
+
+def _check_backend(backend):
+    if backend not in _BACKENDS and backend not in ("auto", "autotune"):
+        raise ValueError(f'backend must be one of {sorted(_BACKENDS)}, "auto" or "autotune"')
+
+
+def _autotune(x, W, stride, dilation, groups, OH, OW):
+    """
+    Times every backend once on the padded input x and caches the fastest
+    per shape.
+    """
+    key = (x.shape, W.shape, stride, dilation, groups, x.dtype.str)
+    if key not in _autotune_cache:
+        timings = {}
+        for name, fn in _BACKENDS.items():
+            start = time.perf_counter()
+            fn(x, W, stride, dilation, groups, OH, OW)
+            timings[name] = time.perf_counter() - start
+        _autotune_cache[key] = min(timings, key=timings.get)
+    return _autotune_cache[key]
+
+
+def _choose_backend(x_shape, W_shape, stride, dilation, groups, OH, OW):
+    """
+    Picks im2col or fft from rough operation counts: GEMM work grows with
+    the kernel area, FFT work with the padded image area times log size.
+    """
+    N, C, H, Wd = x_shape
+    C_out, C_g, KH, KW = W_shape
+    gemm = 2.0 * N * C_out * OH * OW * C_g * KH * KW
+
+    fh, fw = _next_fast_len(H), _next_fast_len(Wd)
+    area = fh * (fw // 2 + 1)
+    transforms = 5.0 * (N * C + C_out * C_g + N * C_out) * fh * fw * math.log2(max(fh * fw, 2))
+    products = 8.0 * N * C_out * C_g * area
+    return "fft" if transforms + products < gemm else "im2col"
+
+
+def conv2d_general(x, W, b=None, stride=1, padding=0, dilation=1, groups=1,
+                   backend="auto", dtype=np.float64):
+    """
+    2D convolution (cross-correlation) forward pass with stride, padding,
+    dilation and groups.
+    x: (N, C_in, H, W), W: (C_out, C_in // groups, KH, KW), b: (C_out,) or None.
+    padding: int, (pad_h, pad_w), "valid" or "same" (stride 1 only).
+    backend: "im2col" (GEMM, best for small kernels), "fft" (best for large
+    kernels), "auto" (operation-count heuristic) or "autotune" (times both
+    once per shape and caches the winner).
+    dtype: np.float64, or np.float32 for faster, lower-precision compute.
+    """
+    _check_backend(backend)
+    x = np.asarray(x, dtype=dtype)
+    W = np.asarray(W, dtype=dtype)
+
+    N, C_in, H, Wd = x.shape
+    C_out, C_g, KH, KW = W.shape
+    if C_in % groups or C_out % groups or C_g != C_in // groups:
+        raise ValueError("channel counts do not match groups")
+
+    stride = _pair(stride)
+    dilation = _pair(dilation)
+    KHd, KWd = (KH - 1) * dilation[0] + 1, (KW - 1) * dilation[1] + 1
+
+    pads = _resolve_padding(padding, stride, KHd, KWd)
+    if any(pads[0]) or any(pads[1]):
+        x = np.pad(x, ((0, 0), (0, 0)) + pads)
+
+    H_p, W_p = x.shape[2], x.shape[3]
+    OH = (H_p - KHd) // stride[0] + 1
+    OW = (W_p - KWd) // stride[1] + 1
+    if OH <= 0 or OW <= 0:
+        raise ValueError("kernel larger than padded input")
+
+    if backend == "auto":
+        backend = _choose_backend(x.shape, W.shape, stride, dilation, groups, OH, OW)
+    elif backend == "autotune":
+        backend = _autotune(x, W, stride, dilation, groups, OH, OW)
+
+    y = _BACKENDS[backend](x, W, stride, dilation, groups, OH, OW)
+    if b is not None:
+        y += np.asarray(b, dtype=dtype).reshape(1, C_out, 1, 1)
+    return y
+
+
+def _tile_bytes(backend, nb, th, tw, C_in, C_out, C_g, KH, KW, stride, KHd, KWd, groups,
+                itemsize, num_workers):
+    """
+    Estimated peak bytes of num_workers tiles in flight plus the state they
+    share. Per tile: the clipped and halo-padded input copies, the backend's
+    work arrays and the tile result before it is copied into the output.
+    """
+    h_in = (th - 1) * stride[0] + KHd
+    w_in = (tw - 1) * stride[1] + KWd
+    inp = 2 * nb * C_in * h_in * w_in
+    res = nb * C_out * th * tw
+    shared = 0
+    if backend == "fft":
+        fh, fw = _next_fast_len(h_in), _next_fast_len(w_in)
+        real = fh * fw
+        cplx = 2 * fh * (fw // 2 + 1)
+        O_g = C_out // groups
+        # rfft2: zero-padded real input, row-pass intermediate and spectrum;
+        # per group: einsum product, inverse row pass and full real output
+        work = nb * C_in * (real + 2 * cplx) + nb * O_g * (2 * cplx + real)
+        # the kernel spectrum is computed once and shared by all tiles
+        shared = C_out * C_g * cplx
+    else:
+        # column matrix and GEMM result of one group
+        work = nb * th * tw * (C_g * KH * KW + C_out // groups)
+    return (shared + num_workers * (inp + work + res)) * itemsize
+
+
+def conv2d_tiled(x, W, b=None, stride=1, padding=0, dilation=1, groups=1,
+                 backend="auto", dtype=np.float64, out=None,
+                 max_bytes=256 << 20, num_workers=1):
+    """
+    Memory-bounded conv2d_general: the output is computed in batch slices
+    and spatial tiles, each reading only its input window plus the kernel
+    halo, and written into a preallocated buffer.
+    out: optional (N, C_out, OH, OW) array of dtype to write into.
+    max_bytes: estimated peak working memory across all workers, excluding x and out.
+    num_workers: tiles run on a thread pool; BLAS and FFT release the GIL.
+    Returns out.
+    """
+    _check_backend(backend)
+    x = np.asarray(x)
+    W = np.asarray(W, dtype=dtype)
+
+    N, C_in, H, Wd = x.shape
+    C_out, C_g, KH, KW = W.shape
+    if C_in % groups or C_out % groups or C_g != C_in // groups:
+        raise ValueError("channel counts do not match groups")
+
+    stride = _pair(stride)
+    dilation = _pair(dilation)
+    KHd, KWd = (KH - 1) * dilation[0] + 1, (KW - 1) * dilation[1] + 1
+    (pt, pb), (pl, pr) = _resolve_padding(padding, stride, KHd, KWd)
+    OH = (H + pt + pb - KHd) // stride[0] + 1
+    OW = (Wd + pl + pr - KWd) // stride[1] + 1
+    if OH <= 0 or OW <= 0:
+        raise ValueError("kernel larger than padded input")
+
+    if out is None:
+        out = np.empty((N, C_out, OH, OW), dtype=dtype)
+    elif out.shape != (N, C_out, OH, OW) or out.dtype != np.dtype(dtype):
+        raise ValueError(f"out must have shape {(N, C_out, OH, OW)} and dtype {np.dtype(dtype)}")
+
+    if backend == "auto":
+        backend = _choose_backend((N, C_in, H + pt + pb, Wd + pl + pr), W.shape,
+                                  stride, dilation, groups, OH, OW)
+    # autotune plans tiles for the hungrier backend, then times both on the first tile
+    candidates = list(_BACKENDS) if backend == "autotune" else [backend]
+
+    # shrink the batch slice first (no halo overhead), then rows, then columns
+    workers = max(1, num_workers)
+    itemsize = np.dtype(dtype).itemsize
+    nb, th, tw = N, OH, OW
+    while max(_tile_bytes(name, nb, th, tw, C_in, C_out, C_g, KH, KW, stride, KHd, KWd, groups,
+                          itemsize, workers) for name in candidates) > max_bytes:
+        if nb > 1:
+            nb = (nb + 1) // 2
+        elif th > 1 and th >= tw:
+            th = (th + 1) // 2
+        elif tw > 1:
+            tw = (tw + 1) // 2
+        else:
+            break
+
+    bias = None if b is None else np.asarray(b, dtype=dtype).reshape(1, C_out, 1, 1)
+
+    def tile_input(n0, r0, c0):
+        n1, r1, c1 = min(n0 + nb, N), min(r0 + th, OH), min(c0 + tw, OW)
+        # input window of this tile in padded coordinates, clipped to x
+        top = r0 * stride[0] - pt
+        left = c0 * stride[1] - pl
+        bottom = (r1 - 1) * stride[0] - pt + KHd
+        right = (c1 - 1) * stride[1] - pl + KWd
+        xt = np.asarray(x[n0:n1, :, max(top, 0):min(bottom, H), max(left, 0):min(right, Wd)], dtype=dtype)
+        halo = ((max(-top, 0), max(bottom - H, 0)), (max(-left, 0), max(right - Wd, 0)))
+        if any(halo[0]) or any(halo[1]):
+            xt = np.pad(xt, ((0, 0), (0, 0)) + halo)
+        return xt, n1, r1, c1
+
+    if backend == "autotune":
+        xt, _, r1, c1 = tile_input(0, 0, 0)
+        backend = _autotune(xt, W, stride, dilation, groups, r1, c1)
+    fn = _BACKENDS[backend]
+    if backend == "fft":
+        # one FFT size covers every tile, so the kernel is transformed once
+        fh = _next_fast_len((th - 1) * stride[0] + KHd)
+        fw = _next_fast_len((tw - 1) * stride[1] + KWd)
+        fn = partial(_conv2d_fft, spectrum=(fh, fw, _kernel_spectrum(W, dilation, fh, fw)))
+
+    def run(tile):
+        n0, r0, c0 = tile
+        xt, n1, r1, c1 = tile_input(n0, r0, c0)
+        yt = fn(xt, W, stride, dilation, groups, r1 - r0, c1 - c0)
+        if bias is not None:
+            yt += bias
+        out[n0:n1, :, r0:r1, c0:c1] = yt
+
+    tiles = [(n0, r0, c0) for n0 in range(0, N, nb) for r0 in range(0, OH, th) for c0 in range(0, OW, tw)]
+    if num_workers > 1 and len(tiles) > 1:
+        with ThreadPoolExecutor(num_workers) as pool:
+            list(pool.map(run, tiles))
+    else:
+        for tile in tiles:
+            run(tile)
+    return out
@@ -1,3 +1,6 @@
+import numpy as np
+from itertools import islice
+
 def text_chunking(tokens, chunk_size, overlap):
     """
     Split tokens into fixed-size chunks with optional overlap.
@@ -13,4 +16,72 @@ def text_chunking(tokens, chunk_size, overlap):
             break
 
     return chunks
-    
\ No newline at end of file
+
+
+def text_chunk_views(tokens, chunk_size, overlap):
+    """
+    Zero-copy chunking of a 1-D NumPy token array.
+    Returns (windows, tail): windows is a read-only strided view of shape
+    (num_full, chunk_size) over tokens, tail is a view of the final shorter
+    chunk or None. Together they are the chunks of text_chunking.
+    """
+    tokens = np.asarray(tokens)
+    n = len(tokens)
+    step = chunk_size - overlap
+
+    if n == 0:
+        return tokens.reshape(0, chunk_size), None
+
+    # chunks start at 0, step, ... up to the first start whose chunk reaches the end
+    num_chunks = 1 + max(0, -(-(n - chunk_size) // step))
+    last = (num_chunks - 1) * step
+    has_tail = last + chunk_size > n
+    full = num_chunks - has_tail
+
+    if n >= chunk_size:
+        windows = np.lib.stride_tricks.sliding_window_view(tokens, chunk_size)[::step][:full]
+    else:
+        windows = tokens[:0].reshape(0, chunk_size)
+    tail = tokens[last:] if has_tail else None
+
+    return windows, tail
+
+
+def iter_text_chunks(tokens, chunk_size, overlap):
+    """
+    Lazily yield the chunks of text_chunking.
+    NumPy arrays yield views without copying. Any other iterable, such as
+    iter_file_tokens(path), is consumed with a buffer of chunk_size tokens,
+    so arbitrarily long streams are chunked in constant memory.
+    """
+    step = chunk_size - overlap
+
+    if isinstance(tokens, np.ndarray):
+        windows, tail = text_chunk_views(tokens, chunk_size, overlap)
+        yield from windows
+        if tail is not None:
+            yield tail
+        return
+
+    it = iter(tokens)
+    chunk = list(islice(it, chunk_size))
+    if not chunk:
+        return
+
+    while True:
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        nxt = list(islice(it, step))
+        if not nxt:
+            return
+        chunk = chunk[step:] + nxt
+
+
+def iter_file_tokens(path, encoding="utf-8"):
+    """
+    Yield whitespace-separated tokens of a text file, one line at a time.
+    """
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            yield from line.split()
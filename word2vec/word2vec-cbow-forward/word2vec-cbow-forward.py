@@ -1,3 +1,4 @@
+import heapq
 import torch
 import torch.nn.functional as F
 
@@ -12,3 +13,158 @@ def cbow_forward(context_ids: torch.Tensor, target_id: int, W_in: torch.Tensor,
     loss = -log_probs[target_id]
 
     return loss
+
+
+def _cbow_hidden(context_ids: torch.Tensor, context_mask: torch.Tensor, W_in: torch.Tensor) -> tuple:
+    """
+    Returns (h, maskf, n_ctx): the (B, D) mean of the unmasked context
+    embeddings, the (B, C, 1) float mask and the (B, 1) context counts.
+    """
+    maskf = context_mask.to(W_in.dtype).unsqueeze(2)
+    n_ctx = maskf.sum(dim=1).clamp(min=1.0)
+    h = (W_in[context_ids] * maskf).sum(dim=1) / n_ctx
+    return h, maskf, n_ctx
+
+
+def cbow_ns_forward(context_ids: torch.Tensor, context_mask: torch.Tensor, target_ids: torch.Tensor,
+                    neg_ids: torch.Tensor, W_in: torch.Tensor, W_out: torch.Tensor) -> torch.Tensor:
+    """
+    Returns a scalar torch.Tensor: the mean negative-sampling CBOW loss of a batch.
+    context_ids and context_mask have shape (B, C) (padded contexts, mask True
+    for real words), target_ids (B,), neg_ids (B, K). Costs O((C + K) * D) per example.
+    """
+    h, _, _ = _cbow_hidden(context_ids, context_mask, W_in)
+    pos_scores = (h * W_out[target_ids]).sum(dim=1)
+    neg_scores = torch.bmm(W_out[neg_ids], h.unsqueeze(2)).squeeze(2)
+
+    loss = F.softplus(-pos_scores) + F.softplus(neg_scores).sum(dim=1)
+    return loss.mean()
+
+
+@torch.no_grad()
+def cbow_ns_step_(context_ids: torch.Tensor, context_mask: torch.Tensor, target_ids: torch.Tensor,
+                  neg_ids: torch.Tensor, W_in: torch.Tensor, W_out: torch.Tensor, lr: float) -> torch.Tensor:
+    """
+    One in-place SGD step on the batch with hand-written gradients. Every
+    example applies its own full gradient (summed, not averaged, as in
+    word2vec) and only touched rows are updated, via index_add_.
+    Returns the mean loss before the update.
+    """
+    h, maskf, n_ctx = _cbow_hidden(context_ids, context_mask, W_in)
+    u_pos = W_out[target_ids]
+    u_negs = W_out[neg_ids]
+    pos_scores = (h * u_pos).sum(dim=1)
+    neg_scores = torch.bmm(u_negs, h.unsqueeze(2)).squeeze(2)
+    coef_pos = (torch.sigmoid(pos_scores) - 1.0).unsqueeze(1)
+    sig_negs = torch.sigmoid(neg_scores)
+
+    grad_h = coef_pos * u_pos + torch.bmm(sig_negs.unsqueeze(1), u_negs).squeeze(1)
+    grad_ctx = (grad_h / n_ctx).unsqueeze(1) * maskf
+    W_in.index_add_(0, context_ids.reshape(-1), grad_ctx.reshape(-1, W_in.shape[1]), alpha=-lr)
+    W_out.index_add_(0, target_ids, coef_pos * h, alpha=-lr)
+    W_out.index_add_(0, neg_ids.reshape(-1), (sig_negs.unsqueeze(2) * h.unsqueeze(1)).reshape(-1, W_out.shape[1]),
+                     alpha=-lr)
+
+    loss = F.softplus(-pos_scores) + F.softplus(neg_scores).sum(dim=1)
+    return loss.mean()
+
+
+def build_huffman_tree(counts: torch.Tensor) -> tuple:
+    """
+    Builds a Huffman tree over word counts for hierarchical softmax.
+    Returns (codes, points, code_lens): codes and points are int64 tensors of
+    shape (V, max_depth), padded with 0, holding each word's branch bits and
+    inner-node ids (rows of a (V - 1, D) node matrix) from the root down;
+    code_lens (V,) holds each path length. Frequent words get short paths.
+    """
+    counts = torch.as_tensor(counts).tolist()
+    V = len(counts)
+    heap = [(c, i) for i, c in enumerate(counts)]
+    heapq.heapify(heap)
+
+    # nodes 0..V-1 are leaves, V..2V-2 inner nodes
+    parent = [0] * (2 * V - 1)
+    bit = [0] * (2 * V - 1)
+    next_node = V
+    while len(heap) > 1:
+        c0, n0 = heapq.heappop(heap)
+        c1, n1 = heapq.heappop(heap)
+        parent[n0], bit[n0] = next_node, 0
+        parent[n1], bit[n1] = next_node, 1
+        heapq.heappush(heap, (c0 + c1, next_node))
+        next_node += 1
+    root = next_node - 1
+
+    paths = []
+    for leaf in range(V):
+        code = []
+        point = []
+        node = leaf
+        while V > 1 and node != root:
+            code.append(bit[node])
+            point.append(parent[node] - V)
+            node = parent[node]
+        paths.append((code[::-1], point[::-1]))
+
+    depth = max((len(c) for c, _ in paths), default=0)
+    codes = torch.zeros((V, depth), dtype=torch.int64)
+    points = torch.zeros((V, depth), dtype=torch.int64)
+    code_lens = torch.zeros(V, dtype=torch.int64)
+    for w, (code, point) in enumerate(paths):
+        codes[w, :len(code)] = torch.tensor(code, dtype=torch.int64)
+        points[w, :len(point)] = torch.tensor(point, dtype=torch.int64)
+        code_lens[w] = len(code)
+    return codes, points, code_lens
+
+
+def _hs_path(target_ids, codes, points, code_lens):
+    path_codes = codes[target_ids]
+    path_points = points[target_ids]
+    path_mask = torch.arange(codes.shape[1]).unsqueeze(0) < code_lens[target_ids].unsqueeze(1)
+    return path_codes, path_points, path_mask
+
+
+def cbow_hs_forward(context_ids: torch.Tensor, context_mask: torch.Tensor, target_ids: torch.Tensor,
+                    W_in: torch.Tensor, W_nodes: torch.Tensor, codes: torch.Tensor,
+                    points: torch.Tensor, code_lens: torch.Tensor) -> torch.Tensor:
+    """
+    Returns a scalar torch.Tensor: the mean hierarchical-softmax CBOW loss of a batch.
+    W_nodes has shape (V - 1, D); codes, points and code_lens come from
+    build_huffman_tree. Costs O((C + log V) * D) per example.
+    """
+    h, _, _ = _cbow_hidden(context_ids, context_mask, W_in)
+    path_codes, path_points, path_mask = _hs_path(target_ids, codes, points, code_lens)
+
+    scores = torch.bmm(W_nodes[path_points], h.unsqueeze(2)).squeeze(2)
+    # bit 0 takes sigmoid(score), bit 1 sigmoid(-score)
+    signs = 1.0 - 2.0 * path_codes.to(h.dtype)
+    loss = (F.softplus(-signs * scores) * path_mask).sum(dim=1)
+    return loss.mean()
+
+
+@torch.no_grad()
+def cbow_hs_step_(context_ids: torch.Tensor, context_mask: torch.Tensor, target_ids: torch.Tensor,
+                  W_in: torch.Tensor, W_nodes: torch.Tensor, codes: torch.Tensor, points: torch.Tensor,
+                  code_lens: torch.Tensor, lr: float) -> torch.Tensor:
+    """
+    One in-place SGD step of cbow_hs_forward with hand-written gradients.
+    Returns the mean loss before the update.
+    """
+    h, maskf, n_ctx = _cbow_hidden(context_ids, context_mask, W_in)
+    path_codes, path_points, path_mask = _hs_path(target_ids, codes, points, code_lens)
+
+    nodes = W_nodes[path_points]
+    scores = torch.bmm(nodes, h.unsqueeze(2)).squeeze(2)
+    signs = 1.0 - 2.0 * path_codes.to(h.dtype)
+    pmask = path_mask.to(h.dtype)
+    # d softplus(-s * x) / dx
+    coef = -signs * torch.sigmoid(-signs * scores) * pmask
+
+    grad_h = torch.bmm(coef.unsqueeze(1), nodes).squeeze(1)
+    grad_ctx = (grad_h / n_ctx).unsqueeze(1) * maskf
+    W_in.index_add_(0, context_ids.reshape(-1), grad_ctx.reshape(-1, W_in.shape[1]), alpha=-lr)
+    W_nodes.index_add_(0, path_points.reshape(-1), (coef.unsqueeze(2) * h.unsqueeze(1)).reshape(-1, W_nodes.shape[1]),
+                       alpha=-lr)
+
+    loss = (F.softplus(-signs * scores) * pmask).sum(dim=1)
+    return loss.mean()
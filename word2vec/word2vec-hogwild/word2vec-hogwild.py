@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+
+import torch
+import torch.multiprocessing as mp
+
+
+def _alias_table(probs: torch.Tensor) -> tuple:
+    """
+    Returns (prob, alias) tensors of a Vose alias table over probs.
+    """
+    V = probs.numel()
+    scaled = (probs.to(torch.float64) / probs.sum() * V).tolist()
+    prob = [1.0] * V
+    alias = list(range(V))
+    small = [i for i, x in enumerate(scaled) if x < 1.0]
+    large = [i for i, x in enumerate(scaled) if x >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    return torch.tensor(prob, dtype=torch.float64), torch.tensor(alias, dtype=torch.int64)
+
+
+class HogwildWord2Vec:
+    """
+    Lock-free (Hogwild) word2vec trainer for SGNS or CBOW with negative sampling.
+
+    W_in and W_out live in shared memory (share_memory_()) and every worker
+    applies its sparse minibatch updates to them in place without locks.
+    Each worker trains on a contiguous slice of the token stream. The
+    learning rate decays linearly from lr to min_lr with the number of
+    tokens processed by all workers, read from a shared counter.
+    Checkpoints are written from the calling thread every checkpoint_interval seconds.
+
+    backend="process" forks worker processes (POSIX only); backend="thread"
+    runs threads, which also scale because torch kernels release the GIL.
+    """
+
+    def __init__(self, vocab_size: int, dim: int = 100, mode: str = "sgns", window: int = 5,
+                 num_negatives: int = 5, lr: float = 0.025, min_lr: float = 1e-4,
+                 batch_size: int = 1024, chunk_tokens: int = 10000, num_workers: int = None,
+                 backend: str = "process", checkpoint_path: str = None,
+                 checkpoint_interval: float = 600.0, seed: int = 0):
+        if mode not in ("sgns", "cbow"):
+            raise ValueError('mode must be "sgns" or "cbow"')
+        if backend not in ("process", "thread"):
+            raise ValueError('backend must be "process" or "thread"')
+
+        self.vocab_size = vocab_size
+        self.dim = dim
+        self.mode = mode
+        self.window = window
+        self.num_negatives = num_negatives
+        self.lr = lr
+        self.min_lr = min_lr
+        self.batch_size = batch_size
+        self.chunk_tokens = chunk_tokens
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.backend = backend
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.seed = seed
+
+        g = torch.Generator().manual_seed(seed)
+        self.W_in = ((torch.rand(vocab_size, dim, generator=g) - 0.5) / dim).share_memory_()
+        self.W_out = torch.zeros(vocab_size, dim).share_memory_()
+        # tokens processed by all workers, updated without a lock
+        self.progress = torch.zeros(1, dtype=torch.int64).share_memory_()
+
+    def train(self, tokens: torch.Tensor, noise_probs: torch.Tensor, epochs: int = 1) -> float:
+        """
+        Trains on a 1-D token-id tensor, drawing negatives from noise_probs.
+        Returns wall-clock seconds spent training.
+        """
+        # copied, so the caller's tensor is never moved into shared memory
+        tokens = tokens.reshape(-1).to(torch.int64, copy=True).share_memory_()
+        prob, alias = _alias_table(noise_probs)
+        prob.share_memory_()
+        alias.share_memory_()
+        total_work = max(1, epochs * tokens.numel())
+        self.progress.zero_()
+        # exceptions raised by thread workers; process workers report through exitcode
+        self._errors = []
+
+        args = (tokens, prob, alias, epochs, total_work)
+        if self.backend == "process":
+            ctx = mp.get_context("fork")
+            workers = [ctx.Process(target=self._worker, args=(rank,) + args) for rank in range(self.num_workers)]
+        else:
+            workers = [threading.Thread(target=self._worker, args=(rank,) + args) for rank in range(self.num_workers)]
+
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+
+        last_checkpoint = time.perf_counter()
+        while any(w.is_alive() for w in workers):
+            for w in workers:
+                w.join(timeout=1.0)
+            if self.checkpoint_path and not self._errors and \
+                    time.perf_counter() - last_checkpoint >= self.checkpoint_interval:
+                self.save_checkpoint(self.checkpoint_path)
+                last_checkpoint = time.perf_counter()
+        elapsed = time.perf_counter() - start
+
+        if self._errors:
+            raise RuntimeError("a training worker raised an exception") from self._errors[0]
+        if self.backend == "process" and any(w.exitcode for w in workers):
+            raise RuntimeError("a training worker exited with an error")
+        if self.checkpoint_path:
+            self.save_checkpoint(self.checkpoint_path)
+        return elapsed
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Writes W_in, W_out and progress; the file is replaced atomically.
+        """
+        tmp = path + ".tmp"
+        torch.save({"W_in": self.W_in.clone(), "W_out": self.W_out.clone(),
+                    "progress": int(self.progress.item())}, tmp)
+        os.replace(tmp, path)
+
+    def load_checkpoint(self, path: str) -> None:
+        state = torch.load(path)
+        self.W_in.copy_(state["W_in"])
+        self.W_out.copy_(state["W_out"])
+        self.progress.fill_(state["progress"])
+
+    def _worker(self, rank, tokens, prob, alias, epochs, total_work):
+        try:
+            self._train_slice(rank, tokens, prob, alias, epochs, total_work)
+        except BaseException as exc:
+            if self.backend == "process":
+                raise
+            self._errors.append(exc)
+
+    def _train_slice(self, rank, tokens, prob, alias, epochs, total_work):
+        if self.backend == "process":
+            torch.set_num_threads(1)
+        g = torch.Generator().manual_seed(self.seed + 1 + rank)
+        n = tokens.numel()
+        lo = n * rank // self.num_workers
+        hi = n * (rank + 1) // self.num_workers
+        w = self.window
+
+        for _ in range(epochs):
+            for start in range(lo, hi, self.chunk_tokens):
+                if self._errors:
+                    # another thread failed, the run is abandoned
+                    return
+                end = min(start + self.chunk_tokens, hi)
+                done = int(self.progress.item())
+                lr = max(self.min_lr, self.lr * (1.0 - done / total_work))
+
+                # window tokens of context on both sides, within this worker's slice
+                ctx_lo = max(lo, start - w)
+                ids = tokens[ctx_lo:min(hi, end + w)]
+                centers = torch.arange(start - ctx_lo, end - ctx_lo)
+                if self.mode == "sgns":
+                    self._sgns_chunk(ids, centers, prob, alias, lr, g)
+                else:
+                    self._cbow_chunk(ids, centers, prob, alias, lr, g)
+
+                self.progress.add_(end - start)
+
+    def _negatives(self, n, prob, alias, g):
+        bucket = torch.randint(prob.numel(), (n,), generator=g)
+        coin = torch.rand(n, dtype=torch.float64, generator=g)
+        return torch.where(coin < prob[bucket], bucket, alias[bucket])
+
+    @torch.no_grad()
+    def _sgns_chunk(self, ids, centers, prob, alias, lr, g):
+        offsets = torch.cat((torch.arange(-self.window, 0), torch.arange(1, self.window + 1)))
+        ctx = centers.unsqueeze(1) + offsets
+        mask = (ctx >= 0) & (ctx < ids.numel())
+        center_ids = ids[centers.unsqueeze(1).expand_as(ctx)[mask]]
+        context_ids = ids[ctx[mask]]
+
+        K = self.num_negatives
+        for s in range(0, center_ids.numel(), self.batch_size):
+            c = center_ids[s:s + self.batch_size]
+            p = context_ids[s:s + self.batch_size]
+            negs = self._negatives(c.numel() * K, prob, alias, g).view(-1, K)
+
+            v_c = self.W_in[c]
+            u_pos = self.W_out[p]
+            u_negs = self.W_out[negs]
+            sig_pos = torch.sigmoid((v_c * u_pos).sum(dim=1)).unsqueeze(1)
+            sig_negs = torch.sigmoid(torch.bmm(u_negs, v_c.unsqueeze(2)).squeeze(2))
+
+            grad_vc = (sig_pos - 1.0) * u_pos + torch.bmm(sig_negs.unsqueeze(1), u_negs).squeeze(1)
+            self.W_in.index_add_(0, c, grad_vc, alpha=-lr)
+            self.W_out.index_add_(0, p, (sig_pos - 1.0) * v_c, alpha=-lr)
+            self.W_out.index_add_(0, negs.reshape(-1),
+                                  (sig_negs.unsqueeze(2) * v_c.unsqueeze(1)).reshape(-1, self.dim), alpha=-lr)
+
+    @torch.no_grad()
+    def _cbow_chunk(self, ids, centers, prob, alias, lr, g):
+        offsets = torch.cat((torch.arange(-self.window, 0), torch.arange(1, self.window + 1)))
+        K = self.num_negatives
+        for s in range(0, centers.numel(), self.batch_size):
+            cpos = centers[s:s + self.batch_size]
+            ctx = cpos.unsqueeze(1) + offsets
+            mask = (ctx >= 0) & (ctx < ids.numel())
+            ctx_ids = ids[ctx.clamp(0, ids.numel() - 1)]
+            n_ctx = mask.sum(dim=1, keepdim=True).clamp(min=1)
+            maskf = mask.to(self.W_in.dtype).unsqueeze(2)
+
+            h = (self.W_in[ctx_ids] * maskf).sum(dim=1) / n_ctx
+            target = ids[cpos]
+            negs = self._negatives(cpos.numel() * K, prob, alias, g).view(-1, K)
+
+            u_pos = self.W_out[target]
+            u_negs = self.W_out[negs]
+            sig_pos = torch.sigmoid((h * u_pos).sum(dim=1)).unsqueeze(1)
+            sig_negs = torch.sigmoid(torch.bmm(u_negs, h.unsqueeze(2)).squeeze(2))
+
+            grad_h = (sig_pos - 1.0) * u_pos + torch.bmm(sig_negs.unsqueeze(1), u_negs).squeeze(1)
+            # the averaged input spreads its gradient evenly over the real context words
+            grad_ctx = (grad_h / n_ctx).unsqueeze(1) * maskf
+            self.W_in.index_add_(0, ctx_ids.reshape(-1), grad_ctx.reshape(-1, self.dim), alpha=-lr)
+            self.W_out.index_add_(0, target, (sig_pos - 1.0) * h, alpha=-lr)
+            self.W_out.index_add_(0, negs.reshape(-1),
+                                  (sig_negs.unsqueeze(2) * h.unsqueeze(1)).reshape(-1, self.dim), alpha=-lr)
+
+
+def benchmark_hogwild(num_tokens: int = 1_000_000, vocab_size: int = 20000, dim: int = 100,
+                      worker_counts=None, mode: str = "sgns", backend: str = "process") -> list:
+    """
+    Reports tokens/sec and scaling efficiency (speedup / workers) of
+    HogwildWord2Vec as the worker count grows.
+    Returns list of (num_workers, tokens/sec, efficiency).
+    """
+    if worker_counts is None:
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    g = torch.Generator().manual_seed(0)
+    ranks = torch.arange(1, vocab_size + 1, dtype=torch.float64)
+    counts = 1.0 / ranks
+    tokens = torch.multinomial(counts / counts.sum(), num_tokens, replacement=True, generator=g)
+    noise = counts ** 0.75
+
+    results = []
+    for workers in worker_counts:
+        model = HogwildWord2Vec(vocab_size, dim, mode=mode, num_workers=workers, backend=backend)
+        elapsed = model.train(tokens, noise)
+        tps = num_tokens / elapsed
+        efficiency = tps / (workers * results[0][1]) if results else 1.0
+        results.append((workers, tps, efficiency))
+        print(f"workers={workers:>3}  {tps:12.0f} tokens/s  scaling efficiency={efficiency:6.1%}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_hogwild()
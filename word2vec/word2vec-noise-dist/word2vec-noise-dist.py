@@ -10,4 +10,57 @@ def noise_distribution(counts: torch.Tensor, alpha: float = 0.75) -> torch.Tenso
     probabilities = smoothed_counts / smoothed_counts.sum()
 
     return probabilities
-    
\ No newline at end of file
+
+
+class AliasSampler:
+    """
+    Walker/Vose alias table over a discrete distribution, e.g. the output of
+    noise_distribution. Built once in O(V); every draw is O(1): one uniform
+    bucket and one biased coin, independent of the vocabulary size.
+    """
+
+    def __init__(self, probs: torch.Tensor, seed: int = None):
+        probs = torch.as_tensor(probs, dtype=torch.float64)
+        V = probs.numel()
+        scaled = (probs / probs.sum() * V).tolist()
+
+        prob = [1.0] * V
+        alias = list(range(V))
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # leftovers are 1.0 up to rounding and keep prob 1.0
+
+        self.prob = torch.tensor(prob, dtype=torch.float64)
+        self.alias = torch.tensor(alias, dtype=torch.int64)
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        else:
+            self.generator.seed()
+
+    @classmethod
+    def from_counts(cls, counts: torch.Tensor, alpha: float = 0.75, seed: int = None) -> "AliasSampler":
+        return cls(noise_distribution(counts, alpha), seed=seed)
+
+    def sample(self, shape, generator: torch.Generator = None) -> torch.Tensor:
+        """
+        Returns int64 torch.Tensor of the given shape with i.i.d. draws.
+        """
+        generator = self.generator if generator is None else generator
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        n = 1
+        for dim in shape:
+            n *= dim
+
+        bucket = torch.randint(self.prob.numel(), (n,), generator=generator)
+        coin = torch.rand(n, dtype=torch.float64, generator=generator)
+        draws = torch.where(coin < self.prob[bucket], bucket, self.alias[bucket])
+        return draws.reshape(shape)
@@ -23,3 +23,80 @@ def skipgram_pairs(token_ids: torch.Tensor, window: int) -> torch.Tensor:
     output = torch.tensor(pairs, dtype=torch.int64)
 
     return output
+
+
+def _window_pairs(ids: torch.Tensor, lo: int, hi: int, window: int) -> torch.Tensor:
+    """
+    Returns (center, context) pairs for centers ids[lo:hi], contexts clipped to ids.
+    Rows follow skipgram_pairs order: by center, then by context position.
+    """
+    offsets = torch.cat((torch.arange(-window, 0), torch.arange(1, window + 1)))
+    centers = torch.arange(lo, hi).unsqueeze(1)
+    contexts = centers + offsets
+    mask = (contexts >= 0) & (contexts < ids.numel())
+
+    center_pos = centers.expand_as(contexts)[mask]
+    context_pos = contexts[mask]
+    return torch.stack((ids[center_pos], ids[context_pos]), dim=1)
+
+
+def skipgram_pairs_vectorized(token_ids: torch.Tensor, window: int) -> torch.Tensor:
+    """
+    Returns int64 torch.Tensor of shape (num_pairs, 2), equal to skipgram_pairs,
+    built with offset arithmetic and one boolean mask instead of Python loops.
+    """
+    ids = token_ids.reshape(-1).to(torch.int64)
+    return _window_pairs(ids, 0, ids.numel(), max(window, 0))
+
+
+def skipgram_pair_batches(tokens, window: int, batch_size: int):
+    """
+    Yields int64 torch.Tensors of shape (batch_size, 2) (the last may be shorter)
+    whose concatenation equals skipgram_pairs over the whole token sequence.
+
+    tokens is a 1-D tensor or an iterable of 1-D tensors read as one
+    continuous stream, so context windows span chunk boundaries. Only
+    window tokens of context and less than one batch of pairs are kept
+    between chunks, so the full pair list is never materialised.
+    """
+    window = max(window, 0)
+    if isinstance(tokens, torch.Tensor):
+        tokens = [tokens]
+    # centers per block, so one block yields about one batch of pairs
+    block = max(1, batch_size // max(1, 2 * window))
+
+    pending = []
+    pending_rows = 0
+
+    def emit(pairs):
+        nonlocal pending, pending_rows
+        pending.append(pairs)
+        pending_rows += len(pairs)
+        if pending_rows < batch_size:
+            return
+        merged = torch.cat(pending)
+        full = len(merged) // batch_size * batch_size
+        yield from torch.split(merged[:full], batch_size)
+        pending = [merged[full:]]
+        pending_rows = len(merged) - full
+
+    buf = torch.empty(0, dtype=torch.int64)
+    # first center in buf without emitted pairs
+    start = 0
+    for chunk in tokens:
+        buf = torch.cat((buf, chunk.reshape(-1).to(torch.int64)))
+        # centers before end have their full right context in buf
+        end = buf.numel() - window
+        for lo in range(start, end, block):
+            yield from emit(_window_pairs(buf, lo, min(lo + block, end), window))
+        if end > start:
+            # keep window tokens of left context for the next center
+            keep_from = max(0, end - window)
+            buf = buf[keep_from:]
+            start = end - keep_from
+
+    for lo in range(start, buf.numel(), block):
+        yield from emit(_window_pairs(buf, lo, min(lo + block, buf.numel()), window))
+
+    if pending_rows:
+        yield torch.cat(pending)
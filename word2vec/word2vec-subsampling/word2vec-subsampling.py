@@ -1,10 +1,12 @@
+import numpy as np
 import torch
 
-def subsample_keep_probs(counts: torch.Tensor, t: float = 1e-5) -> torch.Tensor:
+def subsample_keep_probs(counts: torch.Tensor, t: float = 1e-5, dtype: torch.dtype = torch.float32) -> torch.Tensor:
     """
     Returns torch.Tensor of shape (vocab_size,) with the keep-probability for each word.
+    Pass dtype=torch.float64 for huge corpora, where float32 frequencies of rare words lose precision.
     """
-    counts_float = counts.to(torch.float32)
+    counts_float = counts.to(dtype)
     total_count = counts_float.sum()
 
     freqs = counts_float / total_count
@@ -13,4 +15,28 @@ def subsample_keep_probs(counts: torch.Tensor, t: float = 1e-5) -> torch.Tensor:
     output = torch.clamp(keep_probs, max=1.0)
 
     return output
-    
\ No newline at end of file
+
+
+def iter_token_file(path: str, dtype=np.int32, chunk_size: int = 1 << 20):
+    """
+    Yields int64 torch.Tensor chunks of a flat binary token-id file, read
+    through np.memmap so only one chunk is resident at a time.
+    """
+    tokens = np.memmap(path, dtype=dtype, mode="r")
+    for start in range(0, len(tokens), chunk_size):
+        yield torch.from_numpy(tokens[start:start + chunk_size].astype(np.int64))
+
+
+def subsample_stream(chunks, keep_probs: torch.Tensor, generator: torch.Generator = None):
+    """
+    Yields the surviving tokens of each token-id chunk, dropping token w with
+    probability 1 - keep_probs[w] using one vectorized random draw per chunk.
+    chunks is any iterable of 1-D int64 tensors, e.g. iter_token_file(path);
+    the output stream can feed skip-gram pair generation directly.
+    """
+    keep_probs = keep_probs.to(torch.float64)
+    for chunk in chunks:
+        draws = torch.rand(chunk.numel(), dtype=torch.float64, generator=generator)
+        kept = chunk[draws < keep_probs[chunk]]
+        if kept.numel():
+            yield kept